@@ -20,8 +20,31 @@ REDIS_TTL_IDEMPOTENCY = int(os.getenv("REDIS_TTL_IDEMPOTENCY", "86400"))  # 24 h
 # Celery
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
-CELERY_TASK_SERIALIZER = "json"
-CELERY_RESULT_SERIALIZER = "json"
+# msgpack: payloads más chicos y attachments como bytes (sin base64)
+# json se sigue aceptando para mensajes encolados antes del cambio
+CELERY_TASK_SERIALIZER = "msgpack"
+CELERY_RESULT_SERIALIZER = "msgpack"
+CELERY_ACCEPT_CONTENT = ["msgpack", "json"]
+# Tareas I/O-bound (SMTP/API): prefetch 2-4 evita workers ociosos entre fetch al broker
+# 0 = prefetch ilimitado; el worker de maintenance se lanza con --prefetch-multiplier=1
+CELERY_PREFETCH_MULTIPLIER = int(os.getenv("CELERY_PREFETCH_MULTIPLIER", "4"))
+# Procesos prefork por worker de notificaciones (tareas I/O-bound: se puede subir
+# por sobre el número de CPUs; cada proceso mantiene su propio loop y conexiones)
+CELERY_WORKER_CONCURRENCY = int(os.getenv("CELERY_WORKER_CONCURRENCY", "2"))
+# Envíos concurrentes dentro de una tarea send_notification_batch
+CELERY_BATCH_CONCURRENCY = int(os.getenv("CELERY_BATCH_CONCURRENCY", "8"))
+# Payloads por tarea send_notification_batch al encolar con enqueue_notification_batches
+CELERY_BATCH_SIZE = int(os.getenv("CELERY_BATCH_SIZE", "50"))
+# Resultados son JSON pequeños (<1KB) en Redis local: sin compresión por defecto
+# Valores válidos: gzip, bzip2, zstd (requiere celery[zstd]), vacío = sin compresión
+CELERY_RESULT_COMPRESSION = os.getenv("CELERY_RESULT_COMPRESSION") or None
+# Mensajes de tareas pueden llevar adjuntos base64 (cientos de KB): zstd por defecto
+# kombu registra zstd automáticamente si el paquete zstandard está instalado
+CELERY_TASK_COMPRESSION = os.getenv("CELERY_TASK_COMPRESSION", "zstd") or None
+# Eventos de monitoreo (celeryev): solo útiles con Flower conectado, apagados por defecto
+# CELERY_EVENTS=1 habilita eventos del worker, CELERY_SENT_EVENT=1 el evento task-sent
+CELERY_EVENTS = os.getenv("CELERY_EVENTS", "0") == "1"
+CELERY_SENT_EVENT = os.getenv("CELERY_SENT_EVENT", "0") == "1"
 
 # API Keys y autenticación
 API_KEYS = os.getenv("API_KEYS", "").split(",") if os.getenv("API_KEYS") else []
@@ -40,6 +63,8 @@ PROVIDERS_FILE = os.path.join(CONFIG_DIR, "providers.yml")
 POLICY_FILE = os.path.join(CONFIG_DIR, "policy.yml")
 TEMPLATES_DIR = "/app/templates"
 TEMPLATES_BASE_PATH = TEMPLATES_DIR
+# Renders Jinja simultáneos en threads (el render no bloquea el event loop)
+TEMPLATE_RENDER_CONCURRENCY = int(os.getenv("TEMPLATE_RENDER_CONCURRENCY", "8"))
 
 # Estados de tareas Celery
 TASK_STATES = {
@@ -71,6 +96,15 @@ REDIS_KEY_PREFIX = "notify:"
 REDIS_IDEMPOTENCY_PREFIX = f"{REDIS_KEY_PREFIX}idem:"
 REDIS_TASK_PREFIX = f"{REDIS_KEY_PREFIX}task:"
 REDIS_LOG_PREFIX = f"{REDIS_KEY_PREFIX}log:"
+# TTL de las listas de logs de tareas (se renueva en cada escritura)
+REDIS_LOG_TTL = int(os.getenv("REDIS_LOG_TTL", str(7 * 24 * 3600)))  # 7 días
+# Entradas máximas por tarea (recorte aproximado en streams, exacto en listas)
+REDIS_LOG_MAX_ENTRIES = int(os.getenv("REDIS_LOG_MAX_ENTRIES", "500"))
+# Logs de tareas en Redis Streams (XADD MAXLEN ~); REDIS_LOG_STREAM=0 vuelve a listas
+# Las claves existentes en formato lista se siguen escribiendo y leyendo como lista
+REDIS_LOG_STREAM = os.getenv("REDIS_LOG_STREAM", "1") == "1"
+# Canal pub/sub para invalidar cache de configuración de proveedores en workers
+REDIS_PROVIDER_CONFIG_CHANNEL = f"{REDIS_KEY_PREFIX}provider_config_changed"
 
 # Timeouts
 CELERY_TASK_TIMEOUT = int(os.getenv("CELERY_TASK_TIMEOUT", "300"))  # 5 minutos
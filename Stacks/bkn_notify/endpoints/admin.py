@@ -8,10 +8,10 @@ from typing import Dict, List, Any
 from fastapi import APIRouter, HTTPException, Depends
 from datetime import datetime
 
-from utils.config_loader import load_providers_config, load_config, load_policy_config
+from utils.config_loader import load_providers_config, load_config, load_policy_config, reload_all_configs
 from utils.template_loader import get_available_templates 
 from utils.redis_client import get_redis_client
-from constants import HTTP_404_NOT_FOUND, HTTP_503_SERVICE_UNAVAILABLE
+from constants import HTTP_404_NOT_FOUND, HTTP_503_SERVICE_UNAVAILABLE, REDIS_PROVIDER_CONFIG_CHANNEL
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -210,6 +210,32 @@ async def get_system_config():
         )
 
 
+@router.post("/config/reload", response_model=Dict[str, Any])
+async def reload_system_config(redis_client = Depends(get_redis_client)):
+    """
+    Recarga configuración en la API y avisa a los workers Celery
+    Los workers limpian su cache de providers al recibir el mensaje pub/sub
+    """
+    try:
+        reload_all_configs()
+        workers_notified = await redis_client.publish(REDIS_PROVIDER_CONFIG_CHANNEL, "reload")
+        
+        logging.info(f"Configuration reloaded, {workers_notified} worker(s) notified")
+        
+        return {
+            "status": "success",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "workers_notified": workers_notified
+        }
+        
+    except Exception as e:
+        logging.error(f"Error reloading config: {e}")
+        raise HTTPException(
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Failed to reload config: {str(e)}"
+        )
+
+
 @router.get("/health", response_model=Dict[str, Any])
 async def admin_health_check(redis_client = Depends(get_redis_client)):
     """
@@ -5,8 +5,10 @@ CON INTEGRACIÓN DE PROVIDER_STATS PARA RECHAZOS
 """
 
 import uuid
+import base64
 import hashlib
 import logging
+import orjson
 from datetime import datetime
 from typing import Union, Dict, Any, Optional
 from fastapi import APIRouter, HTTPException, Request, Depends
@@ -120,8 +122,7 @@ async def handle_idempotency(redis_client, idempotency_key: str, message_id: str
         cached_response = await redis_client.get(cache_key)
         
         if cached_response:
-            import json
-            return json.loads(cached_response)
+            return orjson.loads(cached_response)
             
         return None
         
@@ -133,13 +134,12 @@ async def handle_idempotency(redis_client, idempotency_key: str, message_id: str
 async def cache_idempotent_response(redis_client, idempotency_key: str, response_data: dict):
     """Guarda respuesta en cache de idempotencia"""
     try:
-        import json
         cache_key = f"{REDIS_IDEMPOTENCY_PREFIX}:{idempotency_key}"
         
         await redis_client.setex(
             cache_key, 
             86400,  # 24 horas en segundos
-            json.dumps(response_data)
+            orjson.dumps(response_data, default=str)
         )
         
         logging.debug(f"Cached idempotent response: {idempotency_key}")
@@ -182,6 +182,21 @@ def get_request_metadata(http_request: Request) -> Dict[str, Any]:
     }
 
 
+def _task_attachments(attachments) -> Optional[list]:
+    """Attachments para el payload Celery con contenido en bytes (msgpack los serializa nativamente)"""
+    if not attachments:
+        return None
+    
+    return [
+        {
+            "filename": attachment.filename,
+            "content": base64.b64decode(attachment.content),
+            "content_type": attachment.content_type
+        }
+        for attachment in attachments
+    ]
+
+
 # ✅ NUEVA FUNCIÓN: Manejo centralizado de rechazos
 async def handle_notification_rejection(
     rejection_error: NotificationRejectedError,
@@ -406,7 +421,7 @@ async def process_notification_core(
             "body_text": final_body_text,
             "body_html": final_body_html,
             "vars": request.vars,
-            "attachments": request.attachments,
+            "attachments": _task_attachments(request.attachments),
             "provider": provider,
             "routing_hint": request.routing_hint,
             "timestamp": datetime.utcnow().isoformat()
@@ -2,21 +2,28 @@
 Status endpoints - Consulta estado y logs de notificaciones
 """
 
-import json
+import orjson
 import logging
 from typing import Optional
 from datetime import datetime
 from fastapi import APIRouter, HTTPException, Depends, Query
 
 from constants import (
-    HTTP_404_NOT_FOUND, TASK_STATES, REDIS_TASK_PREFIX, REDIS_LOG_PREFIX
+    HTTP_404_NOT_FOUND, TASK_STATES, REDIS_TASK_PREFIX
 )
 from models.status_response import StatusResponse, LogEntry, LogsResponse
 from utils.redis_client import get_redis_client
 from services.celery_app import get_celery_app
+from services.task_logger import load_task_state, log_event_and_status, dumps_log, read_task_logs
 
 router = APIRouter()
 
+# Campos del estado que usa la consulta de status (el hash completo incluye payload y respuestas)
+_STATUS_FIELDS = [
+    "status", "celery_task_id", "created_at", "provider", "to",
+    "retry_count", "provider_response", "error"
+]
+
 
 @router.get("/notify/{message_id}/status", response_model=StatusResponse)
 async def get_notification_status(
@@ -36,11 +43,10 @@ async def get_notification_status(
     """
     
     try:
-        # Buscar información de la tarea en Redis
-        task_key = f"{REDIS_TASK_PREFIX}{message_id}"
-        task_data = await redis_client.get(task_key)
+        # Buscar información de la tarea en Redis (solo los campos usados)
+        task_info = await load_task_state(redis_client, message_id, fields=_STATUS_FIELDS)
         
-        if not task_data:
+        if not task_info:
             logging.warning(f"Task not found in Redis: {message_id}")
             raise HTTPException(
                 status_code=HTTP_404_NOT_FOUND,
@@ -50,27 +56,42 @@ async def get_notification_status(
                 }
             )
         
-        task_info = json.loads(task_data)
         celery_task_id = task_info.get("celery_task_id")
         
-        # Consultar estado en Celery
-        celery_app = get_celery_app()
-        celery_result = celery_app.AsyncResult(celery_task_id)
-        
-        # Mapear estado de Celery a nuestros estados
-        status = TASK_STATES.get(celery_result.state, "unknown")
-        
-        # Obtener información adicional según el estado
+        # Estado registrado por el worker (las tareas de notificación no guardan
+        # resultado en el backend de Celery: ignore_result=True)
         result_info = {}
         error_info = None
+        retry_count = task_info.get("retry_count", 0)
         
-        if celery_result.state == "SUCCESS":
-            result_info = celery_result.result or {}
-        elif celery_result.state == "FAILURE":
-            error_info = {
-                "error_type": type(celery_result.info).__name__ if celery_result.info else "UnknownError",
-                "error_message": str(celery_result.info) if celery_result.info else "Unknown error occurred"
-            }
+        if task_info.get("status"):
+            status = task_info["status"].upper()
+            
+            if status == "SUCCESS":
+                result_info = task_info.get("provider_response") or {}
+            elif status in ("FAILED", "RETRY", "TIMEOUT"):
+                error = task_info.get("error") or {}
+                retry_count = error.get("retry_count", retry_count)
+                error_info = {
+                    "error_type": error.get("error_type", "UnknownError"),
+                    "error_message": error.get("error_message", "Unknown error occurred")
+                }
+        else:
+            # Sin estado propio: tarea aún en cola (o encolada antes del cambio)
+            celery_app = get_celery_app()
+            celery_result = celery_app.AsyncResult(celery_task_id)
+            
+            # Mapear estado de Celery a nuestros estados
+            status = TASK_STATES.get(celery_result.state, "unknown")
+            retry_count = getattr(celery_result, "retries", 0) or retry_count
+            
+            if celery_result.state == "SUCCESS":
+                result_info = celery_result.result or {}
+            elif celery_result.state == "FAILURE":
+                error_info = {
+                    "error_type": type(celery_result.info).__name__ if celery_result.info else "UnknownError",
+                    "error_message": str(celery_result.info) if celery_result.info else "Unknown error occurred"
+                }
         
         # Construir respuesta
         response = StatusResponse(
@@ -81,7 +102,7 @@ async def get_notification_status(
             updated_at=datetime.utcnow().isoformat(),
             provider=task_info.get("provider"),
             recipients_count=len(task_info.get("to", [])),
-            retry_count=getattr(celery_result, "retries", 0),
+            retry_count=retry_count,
             result=result_info if result_info else None,
             error=error_info
         )
@@ -133,11 +154,8 @@ async def get_notification_logs(
                 }
             )
         
-        # Obtener logs de Redis (almacenados como lista ordenada)
-        log_key = f"{REDIS_LOG_PREFIX}{message_id}"
-        
-        # Contar total de logs
-        total_logs = await redis_client.llen(log_key)
+        # Obtener logs de Redis con paginación (stream o lista, más recientes primero)
+        total_logs, log_entries_raw = await read_task_logs(redis_client, message_id, offset, limit)
         
         if total_logs == 0:
             return LogsResponse(
@@ -147,18 +165,11 @@ async def get_notification_logs(
                 has_more=False
             )
         
-        # Obtener logs con paginación (Redis LRANGE)
-        # Nota: Redis indexa desde el inicio, ajustamos para paginación
-        start_idx = offset
-        end_idx = offset + limit - 1
-        
-        log_entries_raw = await redis_client.lrange(log_key, start_idx, end_idx)
-        
         # Parsear y construir LogEntry objects
         log_entries = []
         for raw_entry in log_entries_raw:
             try:
-                entry_data = json.loads(raw_entry)
+                entry_data = orjson.loads(raw_entry)
                 log_entry = LogEntry(
                     timestamp=entry_data.get("timestamp"),
                     level=entry_data.get("level", "INFO"),
@@ -167,7 +178,7 @@ async def get_notification_logs(
                     details=entry_data.get("details", {})
                 )
                 log_entries.append(log_entry)
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 # Skip malformed log entries
                 continue
         
@@ -210,10 +221,9 @@ async def cancel_notification(
     
     try:
         # Buscar información de la tarea
-        task_key = f"{REDIS_TASK_PREFIX}{message_id}"
-        task_data = await redis_client.get(task_key)
+        task_info = await load_task_state(redis_client, message_id)
         
-        if not task_data:
+        if not task_info:
             raise HTTPException(
                 status_code=HTTP_404_NOT_FOUND,
                 detail={
@@ -222,36 +232,38 @@ async def cancel_notification(
                 }
             )
         
-        task_info = json.loads(task_data)
         celery_task_id = task_info.get("celery_task_id")
         
         # Intentar revocar la tarea en Celery
         celery_app = get_celery_app()
         celery_app.control.revoke(celery_task_id, terminate=True)
         
-        # Actualizar estado en Redis
-        task_info["status"] = "cancelled"
-        task_info["cancelled_at"] = datetime.utcnow().isoformat()
-        await redis_client.setex(task_key, 3600, json.dumps(task_info))
+        cancelled_at = datetime.utcnow().isoformat()
         
-        # Agregar log de cancelación
+        # Log de cancelación
         log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": cancelled_at,
             "level": "INFO", 
             "event": "notification_cancelled",
             "message": "Notification cancelled by user request",
             "details": {"celery_task_id": celery_task_id}
         }
         
-        log_key = f"{REDIS_LOG_PREFIX}{message_id}"
-        await redis_client.lpush(log_key, json.dumps(log_entry))
+        # Actualizar estado y agregar log en Redis (una sola llamada)
+        await log_event_and_status(
+            message_id,
+            status_updates={"status": "cancelled", "cancelled_at": cancelled_at},
+            log_entries=[dumps_log(log_entry)],
+            ttl=3600,
+            defaults=task_info
+        )
         
         logging.info(f"Notification cancelled: {message_id}")
         
         return {
             "message_id": message_id,
             "status": "cancelled",
-            "cancelled_at": task_info["cancelled_at"]
+            "cancelled_at": cancelled_at
         }
         
     except HTTPException:
@@ -61,6 +61,13 @@ async def lifespan(app: FastAPI):
     
     # SHUTDOWN
     logging.info(f"{constants.SERVICE_NAME} shutting down")
+    
+    # SHUTDOWN - Escribir logs de auditoría pendientes
+    try:
+        from services.audit_writer import get_audit_writer
+        await get_audit_writer().close()
+    except Exception as e:
+        logging.error(f"Error flushing audit logs on shutdown: {e}")
 
 
 # Crear app FastAPI con configuración de seguridad para Swagger
@@ -5,8 +5,8 @@ Configuración de logging estructurado JSON para el sistema
 
 import logging
 import logging.config
-import json
 import sys
+import orjson
 from datetime import datetime
 from typing import Dict, Any
 
@@ -107,6 +107,17 @@ def setup_standard_logging():
     logging.config.dictConfig(logging_config)
 
 
+# Atributos estándar de LogRecord (no se copian a extras)
+_RECORD_ATTRS = frozenset([
+    'name', 'msg', 'args', 'levelname', 'levelno', 'pathname',
+    'filename', 'module', 'lineno', 'funcName', 'created',
+    'msecs', 'relativeCreated', 'thread', 'threadName',
+    'processName', 'process', 'getMessage', 'exc_info', 'exc_text',
+    'stack_info', 'request_id', 'message_id', 'celery_task_id', 'event',
+    'taskName', 'message'
+])
+
+
 class JsonFormatter(logging.Formatter):
     """
     Formatter personalizado para logging JSON estructurado
@@ -152,25 +163,17 @@ class JsonFormatter(logging.Formatter):
                 "traceback": self.formatException(record.exc_info)
             }
         
-        # Agregar campos extras del record
-        extras = {}
-        for key, value in record.__dict__.items():
-            if key not in ['name', 'msg', 'args', 'levelname', 'levelno', 'pathname', 
-                          'filename', 'module', 'lineno', 'funcName', 'created', 
-                          'msecs', 'relativeCreated', 'thread', 'threadName', 
-                          'processName', 'process', 'getMessage', 'exc_info', 'exc_text', 
-                          'stack_info', 'request_id', 'message_id', 'celery_task_id', 'event']:
-                try:
-                    # Solo agregar valores serializables
-                    json.dumps(value)
-                    extras[key] = value
-                except (TypeError, ValueError):
-                    extras[key] = str(value)
+        # Agregar campos extras del record (no serializables se convierten con str)
+        extras = {
+            key: value
+            for key, value in record.__dict__.items()
+            if key not in _RECORD_ATTRS
+        }
         
         if extras:
             log_entry["extras"] = extras
         
-        return json.dumps(log_entry, ensure_ascii=False)
+        return orjson.dumps(log_entry, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
 
 
 class RequestLoggingMiddleware:
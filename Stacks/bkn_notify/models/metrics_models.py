@@ -7,7 +7,7 @@ from datetime import datetime
 from typing import Optional, List, Dict, Any, Union
 from enum import Enum
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator, ValidationInfo, validator
 
 
 class MetricsPeriod(BaseModel):
@@ -253,7 +253,8 @@ class MetricsQueryParams(BaseModel):
     template_id: Optional[str] = Field(None, description="Filtrar por template")
     status: Optional[str] = Field(None, description="Filtrar por estado")
     
-    @validator('date_from', 'date_to')
+    @field_validator('date_from', 'date_to')
+    @classmethod
     def validate_date_format(cls, v):
         if v is not None:
             try:
@@ -262,9 +263,11 @@ class MetricsQueryParams(BaseModel):
                 raise ValueError('Date must be in YYYY-MM-DD format')
         return v
     
-    @validator('date_to')
-    def validate_date_range(cls, v, values):
-        if v is not None and 'date_from' in values and values['date_from'] is not None:
+    @field_validator('date_to')
+    @classmethod
+    def validate_date_range(cls, v, info: ValidationInfo):
+        values = info.data
+        if v is not None and values.get('date_from') is not None:
             date_from = datetime.strptime(values['date_from'], '%Y-%m-%d')
             date_to = datetime.strptime(v, '%Y-%m-%d')
             if date_to < date_from:
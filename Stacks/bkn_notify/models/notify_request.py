@@ -6,6 +6,15 @@ Esquemas de validación para el sistema de notificaciones
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
 from datetime import datetime
+import base64
+import re
+
+
+# Patrones precompilados usados por los validators
+_CONTROL_CHARS_RE = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_TEMPLATE_RE = re.compile(r'^[a-zA-Z0-9\-_]+/v\d+$')
+_NAME_RE = re.compile(r'^[a-zA-Z0-9\-_]+$')
 
 
 class AttachmentModel(BaseModel):
@@ -36,7 +45,6 @@ class AttachmentModel(BaseModel):
     @classmethod
     def validate_content(cls, v):
         """Valida contenido base64"""
-        import base64
         try:
             # Verificar que es base64 válido
             base64.b64decode(v, validate=True)
@@ -140,12 +148,11 @@ class NotifyRequest(BaseModel):
             return v
         
         # Remover caracteres de control
-        import re
-        if re.search(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', v):
+        if _CONTROL_CHARS_RE.search(v):
             raise ValueError("Subject contains control characters")
         
         # Normalizar espacios
-        normalized = re.sub(r'\s+', ' ', v.strip())
+        normalized = _WHITESPACE_RE.sub(' ', v.strip())
         
         return normalized
     
@@ -155,16 +162,15 @@ class NotifyRequest(BaseModel):
         """Valida y normaliza formato del template ID"""
         if not v:
             return v
-            
-        import re
         
         # Convertir punto a slash (cert-summary.v1 -> cert-summary/v1)
-        if '.' in v and 'v' in v:
-            # Buscar patrón name.vN y convertir a name/vN
-            v = re.sub(r'\.v(\d+)$', r'/v\1', v)
+        if '.v' in v:
+            head, sep, tail = v.rpartition('.v')
+            if sep and tail.isdecimal():
+                v = f"{head}/v{tail}"
         
         # Validar formato final
-        if not re.match(r'^[a-zA-Z0-9\-_]+/v\d+$', v):
+        if not _TEMPLATE_RE.match(v):
             raise ValueError("template_id must follow format: template-name/vN")
         
         return v
@@ -177,8 +183,7 @@ class NotifyRequest(BaseModel):
             return v
         
         # Solo caracteres alfanuméricos, guiones y guiones bajos
-        import re
-        if not re.match(r'^[a-zA-Z0-9\-_]+$', v):
+        if not _NAME_RE.match(v):
             raise ValueError("provider name can only contain letters, numbers, hyphens and underscores")
         
         return v
@@ -218,9 +223,8 @@ class NotifyRequest(BaseModel):
                 raise ValueError(f"Cannot override reserved header: {header_name}")
         
         # Validar formato de headers
-        import re
         for name, value in v.items():
-            if not re.match(r'^[a-zA-Z0-9\-_]+$', name):
+            if not _NAME_RE.match(name):
                 raise ValueError(f"Invalid header name: {name}")
             
             if len(str(value)) > 998:  # RFC limit
@@ -4,7 +4,7 @@ Esquemas para consulta de estado y logs de notificaciones
 """
 
 from typing import List, Optional, Dict, Any, Union
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_serializer, field_validator
 from datetime import datetime
 from enum import Enum
 
@@ -18,6 +18,7 @@ class TaskStatus(str, Enum):
     SUCCESS = "SUCCESS"           # Enviada exitosamente
     FAILED = "FAILED"             # Falló el envío
     RETRY = "RETRY"               # En proceso de reintento
+    TIMEOUT = "TIMEOUT"           # Superó el límite de tiempo de la tarea
     CANCELLED = "CANCELLED"       # Cancelada manualmente
 
 
@@ -286,10 +287,11 @@ class BatchStatusResponse(BaseModel):
     average_processing_time: Optional[float] = Field(default=None, description="Tiempo promedio de procesamiento")
     throughput_per_minute: Optional[float] = Field(default=None, description="Mensajes procesados por minuto")
     
-    @field_validator('progress_percentage')
-    @classmethod
-    def validate_progress(cls, v):
-        """Valida que el progreso esté entre 0 y 100"""
+    @field_serializer('progress_percentage')
+    def serialize_progress(self, v):
+        """Acota el progreso entre 0 y 100 al serializar"""
+        if v is None:
+            return v
         if v < 0:
             return 0.0
         elif v > 100:
@@ -344,10 +346,9 @@ class MetricsResponse(BaseModel):
     # Metadata
     generated_at: datetime = Field(default_factory=datetime.utcnow, description="Timestamp de generación")
     
-    @field_validator('success_rate', 'bounce_rate')
-    @classmethod
-    def validate_rates(cls, v):
-        """Valida que las tasas estén entre 0 y 100"""
+    @field_serializer('success_rate', 'bounce_rate')
+    def serialize_rates(self, v):
+        """Acota las tasas entre 0 y 100 al serializar"""
         if v < 0:
             return 0.0
         elif v > 100:
@@ -7,6 +7,55 @@ from pydantic import BaseModel, Field, field_validator, model_validator
 import re
 
 
+# Formato final aceptado para template_id (template-name/vN)
+_TEMPLATE_RE = re.compile(r'^[a-zA-Z0-9\-_]+/v\d+$')
+# Formato internacional: + seguido de 8 a 15 dígitos
+_PHONE_RE = re.compile(r'^\+\d{8,15}$')
+
+
+# Ejemplos de documentación (schema OpenAPI)
+_TWILIO_REQUEST_EXAMPLES = [
+    {
+        "description": "WhatsApp con template",
+        "value": {
+            "to": ["+56912345678"],
+            "template_id": "alerta-simple/v1",
+            "provider": "twilio_whatsapp",
+            "vars": {
+                "host": "web-server-01",
+                "estado": "CRÍTICO",
+                "hora": "15:30",
+                "timestamp": "2024-09-16 15:30:45"
+            }
+        }
+    },
+    {
+        "description": "SMS directo",
+        "value": {
+            "to": ["+56912345678", "+56987654321"],
+            "body_text": "ALERTA: Servidor web-server-01 está CRÍTICO desde las 15:30. Revisar inmediatamente.",
+            "provider": "twilio_sms",
+            "routing_hint": "urgent"
+        }
+    },
+    {
+        "description": "WhatsApp con múltiples destinatarios",
+        "value": {
+            "to": ["+56987654321", "+56912345678"],
+            "template_id": "system-alert/v1",
+            "provider": "twilio_whatsapp",
+            "routing_hint": "high_priority",
+            "vars": {
+                "servidor": "prod-api-01",
+                "tipo_alerta": "espacio_disco",
+                "severidad": "high",
+                "uso_disco": 92
+            }
+        }
+    }
+]
+
+
 class TwilioNotifyRequest(BaseModel):
     """
     Modelo para requests de notificación Twilio (WhatsApp/SMS)
@@ -43,7 +92,7 @@ class TwilioNotifyRequest(BaseModel):
                 raise ValueError(f"Phone number must include country code: {phone}")
             
             # Solo números después del +
-            if not re.match(r'^\+\d{8,15}$', phone):
+            if not _PHONE_RE.match(phone):
                 raise ValueError(f"Invalid phone number format: {phone} (must be +[country][number])")
             
             # Verificar longitud típica
@@ -85,15 +134,15 @@ class TwilioNotifyRequest(BaseModel):
         """Valida formato del template ID"""
         if not v:
             return v
-            
-        import re
         
         # Convertir punto a slash (cert-summary.v1 -> cert-summary/v1)
-        if '.' in v and 'v' in v:
-            v = re.sub(r'\.v(\d+)$', r'/v\1', v)
+        if '.v' in v:
+            head, sep, tail = v.rpartition('.v')
+            if sep and tail.isdecimal():
+                v = f"{head}/v{tail}"
         
         # Validar formato final
-        if not re.match(r'^[a-zA-Z0-9\-_]+/v\d+$', v):
+        if not _TEMPLATE_RE.match(v):
             raise ValueError("template_id must follow format: template-name/vN")
         
         return v
@@ -153,45 +202,6 @@ class TwilioNotifyRequest(BaseModel):
         "validate_assignment": True,
         "extra": "forbid",
         "json_schema_extra": {
-            "examples": [
-                {
-                    "description": "WhatsApp con template",
-                    "value": {
-                        "to": ["+56912345678"],
-                        "template_id": "alerta-simple/v1",
-                        "provider": "twilio_whatsapp",
-                        "vars": {
-                            "host": "web-server-01",
-                            "estado": "CRÍTICO",
-                            "hora": "15:30",
-                            "timestamp": "2024-09-16 15:30:45"
-                        }
-                    }
-                },
-                {
-                    "description": "SMS directo",
-                    "value": {
-                        "to": ["+56912345678", "+56987654321"],
-                        "body_text": "ALERTA: Servidor web-server-01 está CRÍTICO desde las 15:30. Revisar inmediatamente.",
-                        "provider": "twilio_sms",
-                        "routing_hint": "urgent"
-                    }
-                },
-                {
-                    "description": "WhatsApp con múltiples destinatarios",
-                    "value": {
-                        "to": ["+56987654321", "+56912345678"],
-                        "template_id": "system-alert/v1",
-                        "provider": "twilio_whatsapp",
-                        "routing_hint": "high_priority",
-                        "vars": {
-                            "servidor": "prod-api-01",
-                            "tipo_alerta": "espacio_disco",
-                            "severidad": "high",
-                            "uso_disco": 92
-                        }
-                    }
-                }
-            ]
+            "examples": _TWILIO_REQUEST_EXAMPLES
         }
     }
\ No newline at end of file
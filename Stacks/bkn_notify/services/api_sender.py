@@ -3,20 +3,130 @@ API sender service
 Maneja envío de emails via APIs externas (SendGrid, SES, etc.)
 """
 
+import asyncio
+import hashlib
 import logging
+import random
+import time
 import httpx
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import base64
 
+import orjson
+
 from constants import SMTP_TIMEOUT
 
+# Cierres de clientes descartados en curso (el loop solo guarda referencias débiles)
+_CLOSING: set = set()
+
+
+# Campos aceptados por mensaje en send_email_batch (mismos que send_email)
+_MESSAGE_FIELDS = (
+    'to', 'subject', 'body_text', 'body_html', 'cc', 'bcc',
+    'attachments', 'message_id', 'custom_headers'
+)
+
+# Límites de los endpoints batch de cada proveedor
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+RESEND_MAX_BATCH = 100
+MAILGUN_MAX_RECIPIENTS = 1000
+
+# Reintentos en proceso ante errores transitorios del proveedor
+RETRYABLE_STATUS_CODES = (429, 502, 503, 504)
+RETRYABLE_EXCEPTIONS = (httpx.TimeoutException, httpx.RemoteProtocolError, httpx.ConnectError)
+MAX_RETRY_DELAY = 30.0
+
+# Segundos que se reutiliza el último resultado de test_connection
+CONNECTION_TEST_TTL = 30
+
+
+def _emails(addresses: Optional[List[str]]) -> Optional[List[Dict[str, str]]]:
+    """
+    Convierte lista de emails al formato [{"email": ...}] (None si está vacía)
+    """
+    return [{"email": address} for address in addresses] if addresses else None
+
+
+def _attachment_b64(content) -> str:
+    """
+    Contenido de attachment como base64 str
+    Acepta bytes crudos (se codifican al armar el payload) o base64 ya codificado
+    """
+    if isinstance(content, (bytes, bytearray)):
+        return base64.b64encode(content).decode("ascii")
+    return content
+
+
+def _attachment_bytes(content) -> bytes:
+    """
+    Contenido de attachment como bytes crudos para envío multipart
+    """
+    if isinstance(content, str):
+        return base64.b64decode(content)
+    return content
+
 
 class APISender:
     """
     Cliente para envío via APIs externas de email
     """
     
+    # Instancias compartidas por configuración de proveedor (ver APISender.get)
+    _INSTANCES: Dict[str, "APISender"] = {}
+    # Instancias descartadas por recarga de configuración, pendientes de cerrar
+    _RETIRED: List["APISender"] = []
+    
+    @classmethod
+    def get(cls, provider_config: Dict[str, Any]) -> "APISender":
+        """
+        Obtiene el APISender compartido para una configuración de proveedor
+        Reutiliza cliente HTTP, headers y estado entre tareas del proceso
+        """
+        # Clientes de una configuración anterior: se cierran en el loop del caller
+        if cls._RETIRED:
+            retired, cls._RETIRED = cls._RETIRED, []
+            loop = asyncio.get_running_loop()
+            for sender in retired:
+                task = loop.create_task(sender.aclose())
+                _CLOSING.add(task)
+                task.add_done_callback(_CLOSING.discard)
+        
+        key = hashlib.blake2b(
+            orjson.dumps(provider_config, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str),
+            digest_size=8
+        ).hexdigest()
+        
+        sender = cls._INSTANCES.get(key)
+        if sender is None:
+            sender = cls._INSTANCES[key] = cls(provider_config)
+        return sender
+    
+    @classmethod
+    def invalidate(cls):
+        """
+        Descarta las instancias compartidas (recarga de configuración)
+        Puede llamarse desde otro thread: los clientes se cierran en el
+        próximo get() o en close_all()
+        """
+        retired, cls._INSTANCES = cls._INSTANCES, {}
+        cls._RETIRED.extend(retired.values())
+    
+    @classmethod
+    async def close_all(cls):
+        """
+        Cierra los clientes HTTP de todas las instancias compartidas
+        Útil para cleanup en shutdown
+        """
+        senders = list(cls._INSTANCES.values()) + cls._RETIRED
+        cls._INSTANCES = {}
+        cls._RETIRED = []
+        for sender in senders:
+            try:
+                await sender.aclose()
+            except Exception as e:
+                logging.error(f"Error closing API sender ({sender.provider_type}): {e}")
+    
     def __init__(self, provider_config: Dict[str, Any]):
         """
         Inicializa API sender con configuración del proveedor
@@ -35,8 +145,158 @@ class APISender:
         self.from_name = provider_config.get('from_name', '')
         self.reply_to = provider_config.get('reply_to', '')
         
+        # Remitente y reply-to formateados una sola vez
+        if self.from_email and self.from_name:
+            self._from_header = f"{self.from_name} <{self.from_email}>"
+        else:
+            self._from_header = self.from_email
+        self._reply_to_obj = {"email": self.reply_to} if self.reply_to else None
+        
         # Headers personalizados
         self.custom_headers = provider_config.get('headers', {})
+        
+        # Headers HTTP estáticos, construidos una sola vez
+        self._auth_headers_json = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            **self.custom_headers
+        }
+        # SES requiere AWS signature - implementación simplificada
+        self._ses_headers = {
+            "Content-Type": "application/x-amz-json-1.1",
+            "X-Amz-Target": "SimpleEmailService.SendEmail"
+        }
+        # Mailgun usa Basic auth (usuario "api") en lugar de Bearer
+        self._mailgun_auth = ("api", self.api_key)
+        
+        # Cliente HTTP persistente (keep-alive entre envíos)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Concurrencia máxima hacia el proveedor (respeta su rate limit)
+        self.max_concurrent = provider_config.get('max_concurrent', 20)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Último resultado de test_connection (cache para health checks)
+        self._last_test_ts = 0.0
+        self._last_test_result: Optional[Dict[str, Any]] = None
+        
+        # Reintentos HTTP en proceso (antes de devolver el fallo a Celery)
+        self.retry_attempts = provider_config.get('retry_attempts', 3)
+        self.retry_backoff = provider_config.get('retry_backoff', 0.5)
+        self.retry_jitter = provider_config.get('retry_jitter', 0.5)
+        
+        # Builder y sender del proveedor, resueltos una sola vez
+        providers = {
+            'sendgrid': (self._make_sendgrid_builder(), self._send_sendgrid),
+            'ses': (self._build_ses_payload, self._send_ses),
+            'mailgun': (self._build_mailgun_payload, self._send_mailgun),
+            'generic': (self._build_generic_payload, self._send_generic)
+        }
+        self._build, self._send = providers.get(self.provider_type, providers['generic'])
+        
+        # Autenticación del probe de test_connection: la misma que usa el envío
+        probe_auth = {
+            'ses': {"headers": self._ses_headers},
+            'mailgun': {"auth": self._mailgun_auth}
+        }
+        self._probe_auth = probe_auth.get(self.provider_type, {"headers": self._auth_headers_json})
+        
+        # Información del sender (constante por instancia)
+        self._sender_info = {
+            "provider_type": f"api_{self.provider_type}",
+            "endpoint": self.endpoint,
+            "from_email": self.from_email,
+            "from_name": self.from_name,
+            "timeout": self.timeout,
+            "features": {
+                "html_support": True,
+                "attachments": self.provider_type in ['sendgrid', 'mailgun'],
+                "cc_bcc": True,
+                "custom_headers": True,
+                "templates": self.provider_type == 'sendgrid',
+                "batch_send": self.provider_type in ['sendgrid', 'resend', 'mailgun']
+            }
+        }
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """
+        Obtiene cliente HTTP compartido, creándolo en el primer uso
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            # Un cliente creado en otro event loop no es reutilizable
+            self._client_loop = loop
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=True,
+                limits=httpx.Limits(
+                    max_keepalive_connections=self.max_concurrent,
+                    max_connections=self.max_concurrent
+                )
+            )
+        return self._client
+    
+    async def _post_with_retry(self, url: str, **kwargs) -> httpx.Response:
+        """
+        POST con reintentos ante 429/5xx transitorios y errores de red
+        
+        Usa backoff exponencial con jitter y respeta Retry-After cuando el
+        proveedor lo envía. Retorna la última respuesta (o relanza la última
+        excepción) cuando se agotan los intentos.
+        """
+        client = await self._get_client()
+        
+        for attempt in range(self.retry_attempts + 1):
+            last_attempt = attempt == self.retry_attempts
+            
+            try:
+                response = await client.post(url, **kwargs)
+            except RETRYABLE_EXCEPTIONS as e:
+                if last_attempt:
+                    raise
+                delay = self._retry_delay(attempt)
+                logging.warning(f"{self.provider_type} API request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or last_attempt:
+                    return response
+                delay = self._retry_delay(attempt, response.headers.get("Retry-After"))
+                logging.warning(f"{self.provider_type} API responded {response.status_code}, retrying in {delay:.2f}s")
+            
+            await asyncio.sleep(delay)
+    
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Calcula espera antes del próximo intento
+        """
+        if retry_after:
+            try:
+                return min(float(retry_after), MAX_RETRY_DELAY)
+            except ValueError:
+                pass  # Retry-After en formato fecha HTTP: usar backoff
+        
+        delay = self.retry_backoff * (2 ** attempt) * random.uniform(1 - self.retry_jitter, 1)
+        return min(delay, MAX_RETRY_DELAY)
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """
+        Obtiene semáforo de concurrencia del event loop actual
+        (los workers Celery pueden usar un loop distinto por tarea)
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._semaphore_loop = loop
+        return self._semaphore
+    
+    async def aclose(self):
+        """
+        Cierra el cliente HTTP compartido
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     async def send_email(
         self,
@@ -57,38 +317,21 @@ class APISender:
             Dict con resultado del envío
         """
         
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
             # Validar parámetros
             self._validate_send_params(to, subject, body_text, body_html)
             
-            # Construir payload según el proveedor
-            if self.provider_type == 'sendgrid':
-                payload = await self._build_sendgrid_payload(
-                    to, subject, body_text, body_html, cc, bcc, attachments, message_id, custom_headers
-                )
-                response = await self._send_sendgrid(payload)
-            elif self.provider_type == 'ses':
-                payload = await self._build_ses_payload(
-                    to, subject, body_text, body_html, cc, bcc, attachments, message_id, custom_headers
-                )
-                response = await self._send_ses(payload)
-            elif self.provider_type == 'mailgun':
-                payload = await self._build_mailgun_payload(
-                    to, subject, body_text, body_html, cc, bcc, attachments, message_id, custom_headers
-                )
-                response = await self._send_mailgun(payload)
-            else:
-                # Proveedor genérico
-                payload = await self._build_generic_payload(
-                    to, subject, body_text, body_html, cc, bcc, attachments, message_id, custom_headers
-                )
-                response = await self._send_generic(payload)
+            # Construir payload y enviar según el proveedor
+            payload = self._build(
+                to, subject, body_text, body_html, cc, bcc, attachments, message_id, custom_headers
+            )
+            async with self._get_semaphore():
+                response = await self._send(payload)
             
             # Calcular tiempo de envío
-            end_time = datetime.now()
-            send_duration = (end_time - start_time).total_seconds()
+            send_duration = time.perf_counter() - start_time
             
             # Procesar respuesta
             if response.get('success', False):
@@ -100,7 +343,7 @@ class APISender:
                     "recipients_count": len(to) + len(cc or []) + len(bcc or []),
                     "send_duration": send_duration,
                     "api_response": response,
-                    "sent_at": end_time.isoformat()
+                    "sent_at": datetime.now().isoformat()
                 }
                 
                 logging.info(f"Email sent successfully via {self.provider_type} API")
@@ -109,11 +352,13 @@ class APISender:
                 raise Exception(f"API responded with error: {response.get('error', 'Unknown error')}")
                 
         except Exception as e:
-            end_time = datetime.now()
-            send_duration = (end_time - start_time).total_seconds()
+            send_duration = time.perf_counter() - start_time
             
             logging.error(f"API send failed ({self.provider_type}): {e}")
             
+            # Invalidar cache de conexión para que el próximo health check re-pruebe
+            self._last_test_ts = 0.0
+            
             return {
                 "success": False,
                 "error": str(e),
@@ -121,8 +366,201 @@ class APISender:
                 "provider": f"api_{self.provider_type}",
                 "provider_config": self.endpoint,
                 "send_duration": send_duration,
-                "failed_at": end_time.isoformat()
+                "failed_at": datetime.now().isoformat()
+            }
+    
+    async def send_email_batch(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Envía un lote de emails agrupándolos en la menor cantidad de llamadas API
+        
+        SendGrid usa una personalization por mensaje, Resend el endpoint
+        /emails/batch y Mailgun recipient-variables. Los mensajes que no
+        admiten agrupación (attachments, proveedor sin batch) se envían
+        individualmente via send_email.
+        
+        Args:
+            messages: Lista de dicts con los mismos campos que send_email
+        
+        Returns:
+            Lista de resultados en el mismo orden que messages
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+        pending = []
+        
+        # Validar cada mensaje; los inválidos fallan sin llamar a la API
+        for index, message in enumerate(messages):
+            try:
+                self._validate_send_params(
+                    message.get('to'), message.get('subject'),
+                    message.get('body_text'), message.get('body_html')
+                )
+                pending.append(index)
+            except Exception as e:
+                results[index] = self._build_batch_result(
+                    message, {"success": False, "error": str(e), "error_type": type(e).__name__}, 0.0
+                )
+        
+        # Agrupar según las capacidades batch del proveedor
+        if self.provider_type == 'sendgrid':
+            groups, singles = self._group_batch_messages(
+                messages, pending, self._sendgrid_batch_key, SENDGRID_MAX_PERSONALIZATIONS
+            )
+            send_group = self._send_sendgrid_batch
+        elif self.provider_type == 'resend':
+            groups, singles = self._group_batch_messages(
+                messages, pending, self._resend_batch_key, RESEND_MAX_BATCH
+            )
+            send_group = self._send_resend_batch
+        elif self.provider_type == 'mailgun':
+            groups, singles = self._group_batch_messages(
+                messages, pending, self._mailgun_batch_key, MAILGUN_MAX_RECIPIENTS
+            )
+            groups = [
+                chunk for group in groups
+                for chunk in self._split_unique_recipients(messages, group)
+            ]
+            send_group = self._send_mailgun_batch
+        else:
+            groups, singles = [], pending
+            send_group = None
+        
+        # Una llamada API por grupo
+        for group in groups:
+            batch = [messages[index] for index in group]
+            start_time = time.perf_counter()
+            
+            try:
+                async with self._get_semaphore():
+                    responses = await send_group(batch)
+            except Exception as e:
+                logging.error(f"API batch send failed ({self.provider_type}): {e}")
+                responses = [
+                    {"success": False, "error": str(e), "error_type": type(e).__name__}
+                ] * len(batch)
+            
+            send_duration = time.perf_counter() - start_time
+            for index, response in zip(group, responses):
+                results[index] = self._build_batch_result(messages[index], response, send_duration)
+            
+            logging.info(f"Batch of {len(batch)} emails sent via {self.provider_type} API")
+        
+        # Envío individual para los mensajes no agrupables
+        for index in singles:
+            message = messages[index]
+            results[index] = await self.send_email(
+                **{field: message.get(field) for field in _MESSAGE_FIELDS}
+            )
+        
+        return results
+    
+    @staticmethod
+    def _group_batch_messages(messages, indexes, key_fn, max_size):
+        """
+        Agrupa índices de mensajes por clave de contenido y los divide según el límite del proveedor
+        
+        Returns:
+            Tupla (grupos, índices no agrupables)
+        """
+        grouped: Dict[Any, List[int]] = {}
+        singles = []
+        
+        for index in indexes:
+            key = key_fn(messages[index])
+            if key is None:
+                singles.append(index)
+            else:
+                grouped.setdefault(key, []).append(index)
+        
+        groups = [
+            members[i:i + max_size]
+            for members in grouped.values()
+            for i in range(0, len(members), max_size)
+        ]
+        return groups, singles
+    
+    @staticmethod
+    def _split_unique_recipients(messages, group):
+        """
+        Divide un grupo para que cada destinatario aparezca una sola vez (recipient-variables)
+        """
+        chunks, current, seen = [], [], set()
+        for index in group:
+            email = messages[index]['to'][0].lower()
+            if email in seen:
+                chunks.append(current)
+                current, seen = [], set()
+            current.append(index)
+            seen.add(email)
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    @staticmethod
+    def _sendgrid_batch_key(message):
+        """
+        Mensajes con el mismo contenido comparten payload; attachments van individuales
+        """
+        if message.get('attachments'):
+            return None
+        return (message.get('body_text'), message.get('body_html'))
+    
+    @staticmethod
+    def _resend_batch_key(message):
+        """
+        Resend acepta contenido heterogéneo en el batch, pero no attachments
+        """
+        if message.get('attachments'):
+            return None
+        return 'batch'
+    
+    @staticmethod
+    def _mailgun_batch_key(message):
+        """
+        recipient-variables exige mismo contenido y un único destinatario sin CC/BCC
+        """
+        if message.get('attachments') or message.get('cc') or message.get('bcc'):
+            return None
+        if len(message.get('to') or []) != 1:
+            return None
+        headers = tuple(sorted((message.get('custom_headers') or {}).items()))
+        return (message.get('subject'), message.get('body_text'), message.get('body_html'), headers)
+    
+    def _build_batch_result(
+        self,
+        message: Dict[str, Any],
+        response: Dict[str, Any],
+        send_duration: float
+    ) -> Dict[str, Any]:
+        """
+        Construye resultado por mensaje con el mismo formato que send_email
+        """
+        now = datetime.now().isoformat()
+        
+        if response.get('success', False):
+            return {
+                "success": True,
+                "message_id": message.get('message_id'),
+                "provider": f"api_{self.provider_type}",
+                "provider_config": self.endpoint,
+                "recipients_count": (
+                    len(message.get('to') or []) + len(message.get('cc') or []) + len(message.get('bcc') or [])
+                ),
+                "send_duration": send_duration,
+                "api_response": response,
+                "sent_at": now,
+                "batched": True
             }
+        
+        return {
+            "success": False,
+            "message_id": message.get('message_id'),
+            "error": response.get('error', 'Unknown error'),
+            "error_type": response.get('error_type', 'APIError'),
+            "provider": f"api_{self.provider_type}",
+            "provider_config": self.endpoint,
+            "send_duration": send_duration,
+            "failed_at": now
+        }
     
     def _validate_send_params(
         self, 
@@ -146,96 +584,210 @@ class APISender:
         if not self.from_email:
             raise ValueError("from_email is required for API sending")
     
-    async def _build_sendgrid_payload(
-        self, to, subject, body_text, body_html, cc, bcc, attachments, message_id, custom_headers
-    ) -> Dict[str, Any]:
+    def _make_sendgrid_builder(self):
+        """
+        Crea builder de payload SendGrid API v3 especializado para esta instancia
+        
+        from y reply_to se resuelven una sola vez y quedan capturados en el
+        closure; por envío solo se evalúa lo que depende del mensaje.
+        """
+        from_obj = {
+            "email": self.from_email,
+            "name": self.from_name
+        }
+        reply_to_obj = self._reply_to_obj
+        
+        def build(to, subject, body_text, body_html, cc, bcc, attachments, message_id, custom_headers):
+            personalization = {
+                "to": _emails(to),
+                "subject": subject
+            }
+            
+            # Agregar CC/BCC
+            if cc:
+                personalization["cc"] = _emails(cc)
+            if bcc:
+                personalization["bcc"] = _emails(bcc)
+            
+            payload = {
+                "from": from_obj,
+                "personalizations": [personalization],
+                "content": []
+            }
+            
+            # Contenido
+            if body_text:
+                payload["content"].append({
+                    "type": "text/plain",
+                    "value": body_text
+                })
+            if body_html:
+                payload["content"].append({
+                    "type": "text/html",
+                    "value": body_html
+                })
+            
+            # Reply-to
+            if reply_to_obj:
+                payload["reply_to"] = reply_to_obj
+            
+            # Headers personalizados
+            if custom_headers:
+                payload["headers"] = custom_headers
+            
+            # Attachments
+            if attachments:
+                payload["attachments"] = [
+                    {
+                        "content": _attachment_b64(attachment["content"]),
+                        "filename": attachment["filename"],
+                        "type": attachment.get("content_type", "application/octet-stream")
+                    }
+                    for attachment in attachments
+                ]
+            
+            return payload
+        
+        return build
+    
+    async def _send_sendgrid(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Construye payload para SendGrid API v3
+        Envía via SendGrid API
         """
+        response = await self._post_with_retry(
+            f"{self.endpoint}/v3/mail/send",
+            content=orjson.dumps(payload),
+            headers=self._auth_headers_json
+        )
         
-        # Convertir lista de emails a formato SendGrid
-        to_list = [{"email": email} for email in to]
+        if response.status_code == 202:
+            return {
+                "success": True,
+                "provider_message_id": response.headers.get("X-Message-Id"),
+                "status_code": response.status_code
+            }
+        else:
+            return {
+                "success": False,
+                "error": f"SendGrid API error: {response.status_code} - {response.text}",
+                "status_code": response.status_code
+            }
+    
+    def _build_sendgrid_batch_payload(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Construye payload SendGrid con una personalization por mensaje
+        
+        Todos los mensajes deben compartir contenido (ver _sendgrid_batch_key)
+        """
+        first = messages[0]
         
         payload = {
             "from": {
                 "email": self.from_email,
                 "name": self.from_name
             },
-            "personalizations": [{
-                "to": to_list,
-                "subject": subject
-            }],
+            "personalizations": [],
             "content": []
         }
         
-        # Agregar CC/BCC
-        if cc:
-            payload["personalizations"][0]["cc"] = [{"email": email} for email in cc]
-        if bcc:
-            payload["personalizations"][0]["bcc"] = [{"email": email} for email in bcc]
+        for message in messages:
+            personalization = {
+                "to": _emails(message['to']),
+                "subject": message['subject']
+            }
+            if message.get('cc'):
+                personalization["cc"] = _emails(message['cc'])
+            if message.get('bcc'):
+                personalization["bcc"] = _emails(message['bcc'])
+            if message.get('custom_headers'):
+                personalization["headers"] = message['custom_headers']
+            if message.get('message_id'):
+                personalization["custom_args"] = {"message_id": message['message_id']}
+            payload["personalizations"].append(personalization)
         
-        # Contenido
-        if body_text:
+        # Contenido compartido
+        if first.get('body_text'):
             payload["content"].append({
                 "type": "text/plain",
-                "value": body_text
+                "value": first['body_text']
             })
-        if body_html:
+        if first.get('body_html'):
             payload["content"].append({
-                "type": "text/html", 
-                "value": body_html
+                "type": "text/html",
+                "value": first['body_html']
             })
         
         # Reply-to
-        if self.reply_to:
-            payload["reply_to"] = {"email": self.reply_to}
+        if self._reply_to_obj:
+            payload["reply_to"] = self._reply_to_obj
         
-        # Headers personalizados
-        if custom_headers:
-            payload["headers"] = custom_headers
+        return payload
+    
+    async def _send_sendgrid_batch(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Envía lote via SendGrid; el X-Message-Id aplica a todas las personalizations
+        """
+        response = await self._send_sendgrid(self._build_sendgrid_batch_payload(messages))
+        return [response] * len(messages)
+    
+    def _build_resend_batch_payload(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Construye payload para Resend /emails/batch (array JSON)
+        """
+        payload = []
         
-        # Attachments
-        if attachments:
-            payload["attachments"] = []
-            for attachment in attachments:
-                payload["attachments"].append({
-                    "content": attachment["content"],
-                    "filename": attachment["filename"],
-                    "type": attachment.get("content_type", "application/octet-stream")
-                })
+        for message in messages:
+            item = {
+                "from": self._from_header,
+                "to": message['to'],
+                "subject": message['subject']
+            }
+            if message.get('cc'):
+                item["cc"] = message['cc']
+            if message.get('bcc'):
+                item["bcc"] = message['bcc']
+            if message.get('body_text'):
+                item["text"] = message['body_text']
+            if message.get('body_html'):
+                item["html"] = message['body_html']
+            if self.reply_to:
+                item["reply_to"] = self.reply_to
+            if message.get('custom_headers'):
+                item["headers"] = message['custom_headers']
+            payload.append(item)
         
         return payload
     
-    async def _send_sendgrid(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    async def _send_resend_batch(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        Envía via SendGrid API
+        Envía lote via Resend y asocia cada id retornado a su mensaje
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        response = await self._post_with_retry(
+            f"{self.endpoint}/emails/batch",
+            content=orjson.dumps(self._build_resend_batch_payload(messages)),
+            headers=self._auth_headers_json
+        )
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.endpoint}/v3/mail/send",
-                json=payload,
-                headers=headers
-            )
-            
-            if response.status_code == 202:
-                return {
+        if response.status_code == 200:
+            # La respuesta mantiene el orden del array enviado
+            data = orjson.loads(response.content).get("data", [])
+            return [
+                {
                     "success": True,
-                    "provider_message_id": response.headers.get("X-Message-Id"),
-                    "status_code": response.status_code
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"SendGrid API error: {response.status_code} - {response.text}",
+                    "provider_message_id": data[i].get("id") if i < len(data) else None,
                     "status_code": response.status_code
                 }
+                for i in range(len(messages))
+            ]
+        
+        error = {
+            "success": False,
+            "error": f"Resend API error: {response.status_code} - {response.text}",
+            "status_code": response.status_code
+        }
+        return [error] * len(messages)
     
-    async def _build_ses_payload(
+    def _build_ses_payload(
         self, to, subject, body_text, body_html, cc, bcc, attachments, message_id, custom_headers
     ) -> Dict[str, Any]:
         """
@@ -243,7 +795,7 @@ class APISender:
         """
         
         payload = {
-            "Source": f"{self.from_name} <{self.from_email}>" if self.from_name else self.from_email,
+            "Source": self._from_header,
             "Destination": {
                 "ToAddresses": to
             },
@@ -284,34 +836,27 @@ class APISender:
         """
         Envía via Amazon SES API
         """
-        # SES requiere AWS signature - implementación simplificada
-        headers = {
-            "Content-Type": "application/x-amz-json-1.1",
-            "X-Amz-Target": "SimpleEmailService.SendEmail"
-        }
-        
         # Nota: En implementación real necesitaría AWS signature
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                self.endpoint,
-                json=payload,
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                return {
-                    "success": True,
-                    "provider_message_id": response.json().get("MessageId"),
-                    "status_code": response.status_code
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"SES API error: {response.status_code} - {response.text}",
-                    "status_code": response.status_code
-                }
+        response = await self._post_with_retry(
+            self.endpoint,
+            content=orjson.dumps(payload),
+            headers=self._ses_headers
+        )
+        
+        if response.status_code == 200:
+            return {
+                "success": True,
+                "provider_message_id": orjson.loads(response.content).get("MessageId"),
+                "status_code": response.status_code
+            }
+        else:
+            return {
+                "success": False,
+                "error": f"SES API error: {response.status_code} - {response.text}",
+                "status_code": response.status_code
+            }
     
-    async def _build_mailgun_payload(
+    def _build_mailgun_payload(
         self, to, subject, body_text, body_html, cc, bcc, attachments, message_id, custom_headers
     ) -> Dict[str, Any]:
         """
@@ -319,7 +864,7 @@ class APISender:
         """
         
         payload = {
-            "from": f"{self.from_name} <{self.from_email}>" if self.from_name else self.from_email,
+            "from": self._from_header,
             "to": to,
             "subject": subject
         }
@@ -341,37 +886,94 @@ class APISender:
             for key, value in custom_headers.items():
                 payload[f"h:{key}"] = value
         
+        # Attachments como multipart (bytes crudos, sin base64)
+        if attachments:
+            payload["attachment"] = [
+                (
+                    attachment["filename"],
+                    _attachment_bytes(attachment["content"]),
+                    attachment.get("content_type", "application/octet-stream")
+                )
+                for attachment in attachments
+            ]
+        
         return payload
     
     async def _send_mailgun(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
         Envía via Mailgun API
         """
-        auth = ("api", self.api_key)
+        # Separar attachments del form; httpx los envía como multipart
+        attachments = payload.get("attachment")
+        if attachments:
+            payload = {key: value for key, value in payload.items() if key != "attachment"}
+            files = [("attachment", attachment) for attachment in attachments]
+        else:
+            files = None
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.endpoint}/messages",
-                data=payload,
-                auth=auth
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "success": True,
-                    "provider_message_id": result.get("id"),
-                    "message": result.get("message"),
-                    "status_code": response.status_code
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"Mailgun API error: {response.status_code} - {response.text}",
-                    "status_code": response.status_code
-                }
+        response = await self._post_with_retry(
+            f"{self.endpoint}/messages",
+            data=payload,
+            files=files,
+            auth=self._mailgun_auth
+        )
+        
+        if response.status_code == 200:
+            result = orjson.loads(response.content)
+            return {
+                "success": True,
+                "provider_message_id": result.get("id"),
+                "message": result.get("message"),
+                "status_code": response.status_code
+            }
+        else:
+            return {
+                "success": False,
+                "error": f"Mailgun API error: {response.status_code} - {response.text}",
+                "status_code": response.status_code
+            }
+    
+    def _build_mailgun_batch_payload(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Construye payload Mailgun con recipient-variables (un email por destinatario)
+        
+        Todos los mensajes deben compartir contenido (ver _mailgun_batch_key)
+        """
+        first = messages[0]
+        recipient_variables = {
+            message['to'][0]: {"message_id": message.get('message_id') or ''}
+            for message in messages
+        }
+        
+        payload = {
+            "from": self._from_header,
+            "to": [message['to'][0] for message in messages],
+            "subject": first['subject'],
+            "recipient-variables": orjson.dumps(recipient_variables).decode(),
+            "v:message_id": "%recipient.message_id%"
+        }
+        
+        # Contenido
+        if first.get('body_text'):
+            payload["text"] = first['body_text']
+        if first.get('body_html'):
+            payload["html"] = first['body_html']
+        
+        # Headers personalizados
+        if first.get('custom_headers'):
+            for key, value in first['custom_headers'].items():
+                payload[f"h:{key}"] = value
+        
+        return payload
+    
+    async def _send_mailgun_batch(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Envía lote via Mailgun; el id de la cola aplica a todos los destinatarios
+        """
+        response = await self._send_mailgun(self._build_mailgun_batch_payload(messages))
+        return [response] * len(messages)
     
-    async def _build_generic_payload(
+    def _build_generic_payload(
         self, to, subject, body_text, body_html, cc, bcc, attachments, message_id, custom_headers
     ) -> Dict[str, Any]:
         """
@@ -383,7 +985,7 @@ class APISender:
                 "email": self.from_email,
                 "name": self.from_name
             },
-            "to": [{"email": email} for email in to],
+            "to": _emails(to),
             "subject": subject,
             "content": {
                 "text": body_text,
@@ -392,15 +994,18 @@ class APISender:
         }
         
         if cc:
-            payload["cc"] = [{"email": email} for email in cc]
+            payload["cc"] = _emails(cc)
         if bcc:
-            payload["bcc"] = [{"email": email} for email in bcc]
+            payload["bcc"] = _emails(bcc)
         
         if custom_headers:
             payload["headers"] = custom_headers
         
         if attachments:
-            payload["attachments"] = attachments
+            payload["attachments"] = [
+                {**attachment, "content": _attachment_b64(attachment["content"])}
+                for attachment in attachments
+            ]
         
         return payload
     
@@ -408,56 +1013,87 @@ class APISender:
         """
         Envía via API genérica
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            **self.custom_headers
-        }
+        response = await self._post_with_retry(
+            self.endpoint,
+            content=orjson.dumps(payload),
+            headers=self._auth_headers_json
+        )
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                self.endpoint,
-                json=payload,
-                headers=headers
-            )
-            
-            if 200 <= response.status_code < 300:
-                try:
-                    result = response.json()
-                    return {
-                        "success": True,
-                        "response": result,
-                        "status_code": response.status_code
-                    }
-                except:
-                    return {
-                        "success": True,
-                        "response": response.text,
-                        "status_code": response.status_code
-                    }
-            else:
+        if 200 <= response.status_code < 300:
+            try:
+                result = orjson.loads(response.content)
+                return {
+                    "success": True,
+                    "response": result,
+                    "status_code": response.status_code
+                }
+            except:
                 return {
+                    "success": True,
+                    "response": response.text,
+                    "status_code": response.status_code
+                }
+        else:
+            return {
+                "success": False,
+                "error": f"API error: {response.status_code} - {response.text}",
+                "status_code": response.status_code
+            }
+    
+    async def test_connection(self) -> Dict[str, Any]:
+        """
+        Prueba conexión al proveedor API con un HEAD liviano
+        
+        El resultado se reutiliza durante CONNECTION_TEST_TTL segundos para no
+        consumir rate limit del proveedor desde health checks frecuentes.
+        """
+        now = time.monotonic()
+        if self._last_test_result is not None and now - self._last_test_ts < CONNECTION_TEST_TTL:
+            return self._last_test_result
+        
+        try:
+            client = await self._get_client()
+            response = await client.head(self.endpoint, **self._probe_auth)
+            
+            if response.status_code in (401, 403):
+                result = {
                     "success": False,
-                    "error": f"API error: {response.status_code} - {response.text}",
+                    "provider": f"api_{self.provider_type}",
+                    "status": "auth_failed",
+                    "status_code": response.status_code
+                }
+            elif response.status_code >= 500:
+                result = {
+                    "success": False,
+                    "provider": f"api_{self.provider_type}",
+                    "status": "provider_error",
+                    "status_code": response.status_code
+                }
+            else:
+                result = {
+                    "success": True,
+                    "provider": f"api_{self.provider_type}",
+                    "status": "connected",
                     "status_code": response.status_code
                 }
+        
+        except Exception as e:
+            result = {
+                "success": False,
+                "provider": f"api_{self.provider_type}",
+                "status": "connection_failed",
+                "error": str(e)
+            }
+        
+        result["timestamp"] = datetime.utcnow().isoformat() + "Z"
+        
+        self._last_test_ts = time.monotonic()
+        self._last_test_result = result
+        return result
     
     def get_sender_info(self) -> Dict[str, Any]:
         """
         Obtiene información del sender API
+        Dict precalculado en __init__; tratar como solo lectura
         """
-        return {
-            "provider_type": f"api_{self.provider_type}",
-            "endpoint": self.endpoint,
-            "from_email": self.from_email,
-            "from_name": self.from_name,
-            "timeout": self.timeout,
-            "features": {
-                "html_support": True,
-                "attachments": self.provider_type in ['sendgrid', 'mailgun'],
-                "cc_bcc": True,
-                "custom_headers": True,
-                "templates": self.provider_type == 'sendgrid'
-            }
-        }
-   
\ No newline at end of file
+        return self._sender_info
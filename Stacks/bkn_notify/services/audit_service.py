@@ -4,20 +4,42 @@ Registra todas las acciones del sistema de notificaciones
 """
 
 import logging
-from datetime import datetime
-from typing import Optional, Dict, Any
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
 import time
-import json
+
+import orjson
 
 from services.database_service import DatabaseService
+from services.audit_writer import get_audit_writer
 from models.database_models import NotificationStatus
 
 logger = logging.getLogger(__name__)
 
 
+def _now_iso() -> str:
+    """Timestamp UTC actual en formato ISO naive (mismo formato que utcnow().isoformat())"""
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+
+
 class AuditService:
     """Servicio centralizado para auditoría y logging"""
 
+    @staticmethod
+    def _write_log(**row) -> bool:
+        """
+        Registra el log sin bloquear al caller (fire-and-forget)
+        
+        Con event loop activo se encola en el group commit del AuditWriter;
+        sin event loop se escribe en el pool de threads de auditoría.
+        """
+        
+        writer = get_audit_writer()
+        if writer.submit(row) is None:
+            writer.submit_background(row)
+        
+        return True
+
     @staticmethod
     def log_notification_received(
         message_id: str,
@@ -34,17 +56,17 @@ class AuditService:
             "has_attachments": bool(request_data.get("attachments")),
             "source_ip": source_ip,
             "user_agent": user_agent,
-            "payload_size": len(json.dumps(request_data))
+            "payload_size": len(orjson.dumps(request_data, default=str))
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="notification_received",
             event_status="accepted",
             event_message="Notification received via API",
             details_json=details,
             component="api"
-        ) is not None
+        )
 
     @staticmethod
     def log_validation_error(
@@ -59,14 +81,14 @@ class AuditService:
             "request_keys": list(request_data.keys()) if request_data else []
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="validation_error",
             event_status="rejected",
             event_message=f"Validation failed: {', '.join(errors)}",
             details_json=details,
             component="api"
-        ) is not None
+        )
 
     @staticmethod
     def log_task_queued(
@@ -81,10 +103,10 @@ class AuditService:
             "celery_task_id": celery_task_id,
             "provider": provider,
             "queue_name": queue_name,
-            "queued_at": datetime.utcnow().isoformat()
+            "queued_at": _now_iso()
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="task_queued",
             event_status="PENDING",
@@ -92,7 +114,7 @@ class AuditService:
             details_json=details,
             component="api",
             provider=provider
-        ) is not None
+        )
 
     @staticmethod
     def log_task_started(
@@ -104,10 +126,10 @@ class AuditService:
         
         details = {
             "worker_name": worker_name,
-            "started_at": datetime.utcnow().isoformat()
+            "started_at": _now_iso()
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="task_started",
             event_status="processing",
@@ -115,7 +137,7 @@ class AuditService:
             details_json=details,
             component="celery",
             provider=provider
-        ) is not None
+        )
 
     @staticmethod
     def log_template_rendered(
@@ -134,17 +156,17 @@ class AuditService:
             "has_html_body": has_html,
             "has_text_body": has_text,
             "variables_count": len(variables) if variables else 0,
-            "rendered_at": datetime.utcnow().isoformat()
+            "rendered_at": _now_iso()
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="template_rendered",
             event_status="success",
             event_message=f"Template {template_id} rendered successfully",
             details_json=details,
             component="celery"
-        ) is not None
+        )
 
     @staticmethod
     def log_template_error(
@@ -161,14 +183,14 @@ class AuditService:
             "error_message": error_message
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="template_error",
             event_status="failed",
             event_message=f"Template rendering failed: {error_message}",
             details_json=details,
             component="celery"
-        ) is not None
+        )
 
     @staticmethod
     def log_email_sending(
@@ -183,10 +205,10 @@ class AuditService:
             "provider": provider,
             "smtp_host": smtp_host,
             "recipients_count": recipients_count,
-            "sending_started_at": datetime.utcnow().isoformat()
+            "sending_started_at": _now_iso()
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="email_sending",
             event_status="processing",
@@ -194,7 +216,7 @@ class AuditService:
             details_json=details,
             component="smtp",
             provider=provider
-        ) is not None
+        )
 
     @staticmethod
     def log_email_sent(
@@ -209,10 +231,10 @@ class AuditService:
             "provider": provider,
             "provider_response": provider_response,
             "delivery_time_ms": delivery_time_ms,
-            "sent_at": datetime.utcnow().isoformat()
+            "sent_at": _now_iso()
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="email_sent",
             event_status="success",
@@ -221,7 +243,7 @@ class AuditService:
             component="smtp",
             provider=provider,
             processing_time_ms=delivery_time_ms
-        ) is not None
+        )
 
     @staticmethod
     def log_email_failed(
@@ -238,10 +260,10 @@ class AuditService:
             "error_message": error_message,
             "error_code": error_code,
             "retry_attempt": retry_attempt,
-            "failed_at": datetime.utcnow().isoformat()
+            "failed_at": _now_iso()
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="email_failed",
             event_status="failed",
@@ -249,7 +271,7 @@ class AuditService:
             details_json=details,
             component="smtp",
             provider=provider
-        ) is not None
+        )
 
     @staticmethod
     def log_retry_scheduled(
@@ -264,17 +286,17 @@ class AuditService:
             "retry_attempt": retry_attempt,
             "retry_delay_seconds": retry_delay_seconds,
             "max_retries": max_retries,
-            "next_retry_at": (datetime.utcnow().timestamp() + retry_delay_seconds)
+            "next_retry_at": (time.time() + retry_delay_seconds)
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="retry_scheduled",
             event_status="PENDING",
             event_message=f"Retry {retry_attempt}/{max_retries} scheduled in {retry_delay_seconds}s",
             details_json=details,
             component="celery"
-        ) is not None
+        )
 
     @staticmethod
     def log_max_retries_exceeded(
@@ -287,17 +309,17 @@ class AuditService:
         details = {
             "total_attempts": total_attempts,
             "last_error": last_error,
-            "abandoned_at": datetime.utcnow().isoformat()
+            "abandoned_at": _now_iso()
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="max_retries_exceeded",
             event_status="abandoned",
             event_message=f"Abandoned after {total_attempts} attempts",
             details_json=details,
             component="celery"
-        ) is not None
+        )
 
     @staticmethod
     def log_idempotency_hit(
@@ -310,17 +332,17 @@ class AuditService:
         details = {
             "idempotency_key": idempotency_key,
             "original_message_id": original_message_id,
-            "duplicate_detected_at": datetime.utcnow().isoformat()
+            "duplicate_detected_at": _now_iso()
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="idempotency_hit",
             event_status="duplicate",
             event_message=f"Duplicate request detected, returning original: {original_message_id}",
             details_json=details,
             component="api"
-        ) is not None
+        )
 
     @staticmethod
     def log_rate_limit_hit(
@@ -335,17 +357,17 @@ class AuditService:
             "rate_limit_key": rate_limit_key,
             "requests_count": requests_count,
             "window_seconds": window_seconds,
-            "blocked_at": datetime.utcnow().isoformat()
+            "blocked_at": _now_iso()
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="rate_limit_hit",
             event_status="blocked",
             event_message=f"Rate limit exceeded: {requests_count} requests in {window_seconds}s",
             details_json=details,
             component="api"
-        ) is not None
+        )
 
     @staticmethod
     def log_provider_switched(
@@ -360,10 +382,10 @@ class AuditService:
             "original_provider": original_provider,
             "new_provider": new_provider,
             "switch_reason": reason,
-            "switched_at": datetime.utcnow().isoformat()
+            "switched_at": _now_iso()
         }
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=message_id,
             event_type="provider_switched",
             event_status="updated",
@@ -371,7 +393,7 @@ class AuditService:
             details_json=details,
             component="celery",
             provider=new_provider
-        ) is not None
+        )
 
     @staticmethod
     def create_audit_context(message_id: str):
@@ -390,7 +412,7 @@ class AuditContext:
     def start_operation(self, operation_name: str):
         """Inicia medición de una operación"""
         self.operation_name = operation_name
-        self.start_time = time.time()
+        self.start_time = time.perf_counter()
         return self
     
     def finish_operation(self, status: str = "success", details: Optional[Dict[str, Any]] = None):
@@ -398,9 +420,9 @@ class AuditContext:
         if self.start_time is None:
             return False
         
-        processing_time_ms = int((time.time() - self.start_time) * 1000)
+        processing_time_ms = int((time.perf_counter() - self.start_time) * 1000)
         
-        return DatabaseService.add_notification_log(
+        return AuditService._write_log(
             message_id=self.message_id,
             event_type=f"operation_{self.operation_name}",
             event_status=status,
@@ -408,4 +430,4 @@ class AuditContext:
             details_json=details or {},
             component="system",
             processing_time_ms=processing_time_ms
-        ) is not None
\ No newline at end of file
+        )
\ No newline at end of file
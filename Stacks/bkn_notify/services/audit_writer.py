@@ -0,0 +1,197 @@
+"""
+Audit Writer - Group commit de logs de auditoría
+Acumula logs de productores concurrentes y los inserta en lotes
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Dict, Any, List, Set, Tuple
+
+from services.database_service import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+# Pool dedicado para escrituras de auditoría (DatabaseService es síncrono)
+_EXEC = ThreadPoolExecutor(max_workers=4, thread_name_prefix="audit")
+
+
+class AuditWriter:
+    """
+    Ejecutor de group commit para notification_logs
+
+    Cada flusher toma filas de la cola hasta juntar max_batch o hasta que
+    pasen max_wait segundos, y las inserta con un solo INSERT multi-fila.
+    Con max_concurrent_flushes=2 un lote se escribe mientras el siguiente
+    se sigue acumulando.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = 64,
+        max_wait: float = 0.010,
+        max_concurrent_flushes: int = 2
+    ):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_concurrent_flushes = max_concurrent_flushes
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._flushers: List[asyncio.Task] = []
+        # Logs encolados cuyo commit aún no termina (ver drain)
+        self._unresolved: Set[asyncio.Future] = set()
+
+    def _ensure_started(self, loop: asyncio.AbstractEventLoop):
+        """
+        Inicia cola y flushers en el event loop actual
+        """
+        if self._loop is loop and self._queue is not None:
+            return
+
+        if self._queue is not None and not self._queue.empty():
+            logger.warning(f"AuditWriter rebound to new event loop with {self._queue.qsize()} pending logs")
+
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._flushers = [
+            loop.create_task(self._flusher())
+            for _ in range(self.max_concurrent_flushes)
+        ]
+
+    def submit(self, row: Dict[str, Any]) -> Optional[asyncio.Future]:
+        """
+        Encola un log para el próximo lote
+
+        Args:
+            row: Dict con los campos de DatabaseService.add_notification_log
+
+        Returns:
+            Future que se resuelve con True/False tras el commit,
+            o None si no hay event loop activo (usar submit_background)
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+        self._ensure_started(loop)
+
+        future = loop.create_future()
+        self._unresolved.add(future)
+        future.add_done_callback(self._unresolved.discard)
+        self._queue.put_nowait((row, future))
+        return future
+
+    def submit_background(self, row: Dict[str, Any]) -> Future:
+        """
+        Escribe un log en el pool de auditoría sin bloquear al caller
+        Para código síncrono sin event loop (p.ej. workers Celery)
+
+        Returns:
+            concurrent.futures.Future con el NotificationLog creado o None
+        """
+        return _EXEC.submit(DatabaseService.add_notification_log, **row)
+
+    async def _flusher(self):
+        """
+        Loop de un flusher: junta un lote y lo escribe
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        """
+        Escribe un lote en la base de datos sin bloquear el event loop
+        """
+        rows = [row for row, _ in batch]
+
+        try:
+            inserted = await asyncio.get_running_loop().run_in_executor(
+                _EXEC, DatabaseService.add_notification_logs_bulk, rows
+            )
+        except Exception as e:
+            logger.error(f"Error flushing {len(rows)} audit logs: {e}")
+            inserted = 0
+
+        success = inserted == len(rows)
+        for _, future in batch:
+            if not future.done():
+                future.set_result(success)
+
+    async def drain(self):
+        """
+        Escribe ya los logs encolados y espera los lotes en curso
+        Para callers cuyo event loop se detiene al terminar (workers Celery)
+        """
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+
+        for i in range(0, len(pending), self.max_batch):
+            await self._flush(pending[i:i + self.max_batch])
+
+        # Lotes que un flusher ya tomó de la cola
+        in_flight = [future for future in self._unresolved if not future.done()]
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def close(self):
+        """
+        Escribe los logs pendientes y detiene los flushers
+        Llamar antes de cerrar el event loop
+        """
+        # Primero drenar: cancelar un flusher con un lote ya tomado de la cola
+        # perdería esas filas (y dejaría sus futures sin resolver)
+        await self.drain()
+
+        # Los flushers quedan inactivos esperando la cola vacía
+        for task in self._flushers:
+            task.cancel()
+        if self._flushers:
+            await asyncio.gather(*self._flushers, return_exceptions=True)
+        self._flushers = []
+
+        # Logs encolados mientras se detenían los flushers
+        pending = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+
+        for i in range(0, len(pending), self.max_batch):
+            await self._flush(pending[i:i + self.max_batch])
+
+        self._loop = None
+        self._queue = None
+
+
+# Writer global
+_audit_writer: Optional[AuditWriter] = None
+
+
+def get_audit_writer() -> AuditWriter:
+    """
+    Obtiene AuditWriter singleton
+    """
+    global _audit_writer
+
+    if _audit_writer is None:
+        _audit_writer = AuditWriter()
+
+    return _audit_writer
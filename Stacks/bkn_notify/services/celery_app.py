@@ -5,9 +5,11 @@ Configuración centralizada de Celery para el sistema de notificaciones
 
 import os
 import sys
+import socket
 import logging
 from celery import Celery
-from celery.signals import after_setup_logger
+from kombu import Queue
+from celery.signals import setup_logging
 
 # Agregar directorio raíz al path para imports absolutos
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -20,13 +22,38 @@ except ImportError:
     class Constants:
         CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://bkn_redis:6379/0")
         CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://bkn_redis:6379/0")
-        CELERY_TASK_SERIALIZER = "json"
-        CELERY_RESULT_SERIALIZER = "json"
+        CELERY_TASK_SERIALIZER = "msgpack"
+        CELERY_RESULT_SERIALIZER = "msgpack"
+        CELERY_ACCEPT_CONTENT = ["msgpack", "json"]
         CELERY_TASK_TIMEOUT = int(os.getenv("CELERY_TASK_TIMEOUT", "300"))
+        CELERY_PREFETCH_MULTIPLIER = int(os.getenv("CELERY_PREFETCH_MULTIPLIER", "4"))
+        CELERY_WORKER_CONCURRENCY = int(os.getenv("CELERY_WORKER_CONCURRENCY", "2"))
+        CELERY_RESULT_COMPRESSION = os.getenv("CELERY_RESULT_COMPRESSION") or None
+        CELERY_TASK_COMPRESSION = os.getenv("CELERY_TASK_COMPRESSION", "zstd") or None
+        CELERY_EVENTS = os.getenv("CELERY_EVENTS", "0") == "1"
+        CELERY_SENT_EVENT = os.getenv("CELERY_SENT_EVENT", "0") == "1"
         MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
         RETRY_BACKOFF = int(os.getenv("RETRY_BACKOFF", "2"))
     constants = Constants()
 
+# Keepalive TCP hacia Redis (evita conexiones muertas silenciosas tras NAT/escalado)
+_KEEPALIVE_OPTIONS = {
+    getattr(socket, name): value
+    for name, value in (('TCP_KEEPIDLE', 60), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 3))
+    if hasattr(socket, name)
+}
+
+# Opciones de transporte Redis para broker y result backend
+# visibility_timeout cubre una tarea con todos sus reintentos (el default de 1h
+# no está alineado con los timeouts y reintentos reales)
+_REDIS_TRANSPORT_OPTIONS = {
+    'visibility_timeout': getattr(constants, 'CELERY_TASK_TIMEOUT', 300) * (getattr(constants, 'MAX_RETRIES', 3) + 2),
+    'socket_keepalive': True,
+    'socket_keepalive_options': _KEEPALIVE_OPTIONS,
+    'health_check_interval': 30,
+    'retry_on_timeout': True,
+}
+
 # Crear instancia Celery
 celery_app = Celery('notify-celery')
 
@@ -35,26 +62,43 @@ celery_app.conf.update(
     # Broker y backend
     broker_url=getattr(constants, 'CELERY_BROKER_URL', 'redis://bkn_redis:6379/0'),
     result_backend=getattr(constants, 'CELERY_RESULT_BACKEND', 'redis://bkn_redis:6379/0'),
+    broker_transport_options=_REDIS_TRANSPORT_OPTIONS,
+    result_backend_transport_options=_REDIS_TRANSPORT_OPTIONS,
     
     # Serialización
-    task_serializer=getattr(constants, 'CELERY_TASK_SERIALIZER', 'json'),
-    result_serializer=getattr(constants, 'CELERY_RESULT_SERIALIZER', 'json'),
-    accept_content=['json'],
+    task_serializer=getattr(constants, 'CELERY_TASK_SERIALIZER', 'msgpack'),
+    result_serializer=getattr(constants, 'CELERY_RESULT_SERIALIZER', 'msgpack'),
+    accept_content=getattr(constants, 'CELERY_ACCEPT_CONTENT', ['msgpack', 'json']),
+    task_compression=getattr(constants, 'CELERY_TASK_COMPRESSION', 'zstd'),
     
     # Timeouts y retries
     task_time_limit=getattr(constants, 'CELERY_TASK_TIMEOUT', 300),
     task_soft_time_limit=getattr(constants, 'CELERY_TASK_TIMEOUT', 300) - 30,
     task_acks_late=True,
-    worker_prefetch_multiplier=1,
+    worker_prefetch_multiplier=getattr(constants, 'CELERY_PREFETCH_MULTIPLIER', 4),
+    # Pool prefork: las tareas corren en un loop asyncio persistente por proceso
+    # (gevent/eventlet no son compatibles con run_until_complete por tarea)
+    worker_concurrency=getattr(constants, 'CELERY_WORKER_CONCURRENCY', 2),
     
     # Configuración de tareas
     task_routes={
         'services.celery_tasks.send_notification_task': {'queue': 'notifications'},
         'services.celery_tasks.send_test_notification_task': {'queue': 'test'},
         'services.celery_tasks.cleanup_old_logs_task': {'queue': 'maintenance'},
+        'send_notification_batch': {'queue': 'notifications-batch'},
+        'send_notification_bulk': {'queue': 'notifications-batch'},
+        'persist_task_events': {'queue': 'logs'},
     },
     
     # Configuración de colas
+    # maintenance/logs y notifications-batch se consumen en workers aparte con --prefetch-multiplier=1
+    task_queues=(
+        Queue('notifications'),
+        Queue('test'),
+        Queue('notifications-batch'),
+        Queue('maintenance'),
+        Queue('logs'),
+    ),
     task_default_queue='notifications',
     task_create_missing_queues=True,
     
@@ -65,22 +109,24 @@ celery_app.conf.update(
     task_retry_backoff_max=600,  # 10 minutos máximo
     task_retry_jitter=True,
     
-    # Configuración de workers
-    worker_hijack_root_logger=False,
-    worker_log_format='[%(asctime)s: %(levelname)s/%(processName)s] %(message)s',
-    worker_task_log_format='[%(asctime)s: %(levelname)s/%(processName)s][%(task_name)s(%(task_id)s)] %(message)s',
+    # Configuración de workers: logging lo configura configure_worker_logging (un solo sink JSON)
+    worker_hijack_root_logger=True,
     
     # Configuración de resultados
+    # Estado de notificaciones se consulta en Redis (REDIS_TASK_PREFIX), no en el backend
+    task_ignore_result=True,
     result_expires=3600,  # 1 hora
-    result_compression='gzip',
+    result_compression=getattr(constants, 'CELERY_RESULT_COMPRESSION', None),
     
     # Timezone
     timezone='UTC',
     enable_utc=True,
     
-    # Monitoring
-    worker_send_task_events=True,
-    task_send_sent_event=True,
+    # Monitoring (habilitar con CELERY_EVENTS=1 / CELERY_SENT_EVENT=1 cuando corre Flower)
+    worker_send_task_events=getattr(constants, 'CELERY_EVENTS', False),
+    task_send_sent_event=getattr(constants, 'CELERY_SENT_EVENT', False),
+    event_queue_expires=60,
+    event_queue_ttl=5,
     
     # Security
     worker_disable_rate_limits=False,
@@ -98,19 +144,16 @@ except ImportError:
     logging.warning("celery_tasks module not found - no tasks will be autodiscovered")
 
 
-@after_setup_logger.connect
-def setup_loggers(logger, *args, **kwargs):
+@setup_logging.connect
+def configure_worker_logging(*args, **kwargs):
     """
     Configurar logging para Celery workers
+    Con este handler conectado Celery no instala sus propios handlers:
+    un solo StreamHandler JSON en root, igual que la API
     """
-    handler = logging.StreamHandler()
-    handler.setFormatter(
-        logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-    )
-    logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
+    from middleware.logging import setup_logging as setup_service_logging
+    
+    setup_service_logging()
 
 
 def get_celery_app() -> Celery:
@@ -136,7 +179,7 @@ def get_celery_app() -> Celery:
 # ====================================================================
 
 
-@celery_app.task
+@celery_app.task(ignore_result=False)
 def health_check_task():
     """
     Tarea de health check para verificar que Celery funciona
@@ -162,10 +205,9 @@ def test_celery_connection() -> bool:
     Prueba conexión a broker y backend de Celery
     """
     try:
-        # Test broker connection
-        broker_connection = celery_app.connection()
-        broker_connection.ensure_connection(max_retries=3)
-        broker_connection.release()
+        # Test broker connection (conexión del pool de Celery, se devuelve al salir)
+        with celery_app.connection_or_acquire() as broker_connection:
+            broker_connection.ensure_connection(timeout=1, max_retries=0)
         
         logging.info("Celery connection test passed")
         return True
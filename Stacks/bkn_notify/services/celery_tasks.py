@@ -5,28 +5,316 @@ Celery tasks para procesamiento de notificaciones
 Workers que manejan envío de correos y Twilio en background - VERSION CORREGIDA
 """
 
-import json
+import re
+import time
+import random
+import socket
 import logging
 import asyncio
+import contextvars
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from types import SimpleNamespace
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Set
 
-from celery import Task
-from celery.exceptions import MaxRetriesExceededError
+import redis as redis_sync
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+from celery import Task, group
+from celery.exceptions import MaxRetriesExceededError, Retry, SoftTimeLimitExceeded
+from celery.signals import worker_process_init, worker_process_shutdown
 
 from .celery_app import get_celery_app
-from utils.config_loader import get_provider_config
-from .smtp_sender import SMTPSender
-from .api_sender import APISender
+from utils.config_loader import get_provider_config, get_enabled_providers, reload_all_configs
 from services.database_service import DatabaseService
+from services.audit_writer import get_audit_writer
+from services.task_logger import log_event_and_status, dumps_log
+from utils.redis_client import get_redis_client, get_redis_helper, close_redis_client
 
 from constants import (
-    REDIS_TASK_PREFIX, REDIS_LOG_PREFIX, MAX_RETRIES, RETRY_BACKOFF,
-    CELERY_TASK_TIMEOUT
+    REDIS_TASK_PREFIX, REDIS_LOG_PREFIX, REDIS_LOG_MAX_ENTRIES, MAX_RETRIES, RETRY_BACKOFF,
+    CELERY_TASK_TIMEOUT, REDIS_URL, REDIS_PROVIDER_CONFIG_CHANNEL,
+    CELERY_BATCH_CONCURRENCY, CELERY_BATCH_SIZE
 )
 
 celery_app = get_celery_app()
 
+# Event loop persistente por proceso worker (prefork: un loop por proceso hijo)
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+# Thread pub/sub que invalida la cache de configuración de proveedores
+_CONFIG_LISTENER = None
+# Escrituras Redis en segundo plano (flush de tareas exitosas); corren mientras
+# el loop sigue activo y _run_async las espera antes de devolver la tarea a Celery
+_BACKGROUND: set = set()
+# Flushes de tareas exitosas pendientes: se escriben en lote (ver _drain_task_flushes)
+_PENDING_FLUSHES: List["TaskLogBuffer"] = []
+_FLUSH_DRAINER: Optional[asyncio.Task] = None
+_FLUSH_BATCH_SIZE = 64
+
+# Clases de sender importadas en el primer envío (httpx/orjson no se cargan
+# al iniciar el worker ni al importar este módulo desde la API)
+_SMTP_SENDER_CLS = None
+_API_SENDER_CLS = None
+# Igual para Twilio y el renderer de templates (Jinja)
+_TWILIO_SERVICE_CLS = None
+_RENDER_TEMPLATE = None
+
+# Clasificación de errores transitorios (ver _should_retry_error)
+# Los senders envuelven sus errores en Exception genéricas ("SMTP connection error: ...",
+# "SMTP error: (421, ...)", "... API error: 503 - ..."): se clasifican por el mensaje
+_TRANSIENT_RE = re.compile(
+    r'timeout|temporarily|rate.?limit|connection (?:reset|refused|error)|disconnected'
+    r'|\b(?:421|429|45[0-2]|50[234])\b',
+    re.I
+)
+_TRANSIENT_EXC = (ConnectionError, TimeoutError, asyncio.TimeoutError, socket.timeout, socket.gaierror)
+_TRANSIENT_STATUS_CODES = frozenset({421, 429, 450, 451, 452, 502, 503, 504})
+
+# Tope del countdown entre reintentos (retry_backoff_max de send_notification)
+_RETRY_BACKOFF_MAX = 600
+# Base del backoff exponencial en segundos (retry_backoff de send_notification)
+_RETRY_BACKOFF_FACTOR = RETRY_BACKOFF * 60
+# Countdown máximo por intento (antes del jitter), calculado una vez
+_RETRY_COUNTDOWN_TABLE = tuple(
+    min(_RETRY_BACKOFF_MAX, _RETRY_BACKOFF_FACTOR * (2 ** retries))
+    for retries in range(MAX_RETRIES + 1)
+)
+
+
+def _get_worker_loop() -> asyncio.AbstractEventLoop:
+    """
+    Obtiene el event loop persistente del proceso worker
+    Se reutiliza entre tareas para conservar conexiones (Redis, httpx)
+    """
+    global _LOOP
+    
+    if _LOOP is None or _LOOP.is_closed():
+        # uvloop (Task/Future y selector en C) si está instalado
+        _LOOP = uvloop.new_event_loop() if UVLOOP_AVAILABLE else asyncio.new_event_loop()
+        # Python 3.12+: las tareas (gather, create_task) arrancan en el momento y las que
+        # terminan sin suspender (escrituras al TaskLogBuffer) no pasan por la cola del loop
+        if hasattr(asyncio, "eager_task_factory"):
+            _LOOP.set_task_factory(asyncio.eager_task_factory)
+        asyncio.set_event_loop(_LOOP)
+    
+    return _LOOP
+
+
+def _spawn_background(coro) -> asyncio.Task:
+    """
+    Programa una corrutina en el loop del worker sin esperarla
+    Mantiene la referencia hasta que termina (el loop solo guarda referencias débiles)
+    """
+    task = asyncio.get_running_loop().create_task(coro)
+    _BACKGROUND.add(task)
+    task.add_done_callback(_BACKGROUND.discard)
+    return task
+
+
+def _run_async(coro):
+    """
+    Ejecuta una corrutina en el loop persistente del worker
+    Corre en el thread de la tarea para que self.request / self.retry sigan funcionando
+    """
+    loop = _get_worker_loop()
+    task = loop.create_task(coro)
+    try:
+        return loop.run_until_complete(task)
+    finally:
+        if not task.done():
+            # Interrumpida fuera de la corrutina (p.ej. SoftTimeLimitExceeded durante el
+            # select del loop): se cancela para que no continúe en la próxima tarea
+            task.cancel()
+            loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+        
+        # El loop solo corre dentro de _run_async: lo diferido se escribe ahora
+        # (con el worker ocioso quedaría en memoria hasta la próxima tarea)
+        try:
+            loop.run_until_complete(_drain_pending_writes())
+        except Exception as e:
+            logging.error(f"Error draining pending task writes: {e}")
+
+
+async def _drain_pending_writes():
+    """
+    Espera las escrituras en segundo plano (flush Redis de tareas exitosas)
+    y los logs de auditoría encolados en el group commit
+    """
+    pending = [task for task in _BACKGROUND if not task.done()]
+    while pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        pending = [task for task in _BACKGROUND if not task.done()]
+    
+    await get_audit_writer().drain()
+
+
+@lru_cache(maxsize=128)
+def _get_provider_config_cached(provider: str) -> Optional[Dict[str, Any]]:
+    """
+    Configuración de proveedor cacheada por proceso worker
+    Se invalida al recibir un mensaje en REDIS_PROVIDER_CONFIG_CHANNEL
+    (p.ej. redis-cli PUBLISH notify:provider_config_changed 1)
+    """
+    return get_provider_config(provider)
+
+
+def _on_provider_config_changed(message):
+    """
+    Handler pub/sub: recarga configuración y limpia cache del worker
+    """
+    reload_all_configs()
+    _get_provider_config_cached.cache_clear()
+    # Senders API con la configuración anterior (cliente HTTP, headers, reintentos)
+    if _API_SENDER_CLS is not None:
+        _API_SENDER_CLS.invalidate()
+    # Recarga en este thread (no en la próxima tarea)
+    _warm_provider_config_cache()
+    logging.info("Provider config cache invalidated")
+
+
+def _warm_provider_config_cache():
+    """
+    Precarga la configuración de todos los proveedores habilitados
+    Así ninguna tarea paga la lectura/parseo del YAML
+    """
+    try:
+        for provider in get_enabled_providers():
+            _get_provider_config_cached(provider)
+    except Exception as e:
+        logging.warning(f"Provider config warm-up failed: {e}")
+
+
+def _start_provider_config_listener():
+    """
+    Escucha invalidaciones de configuración en un thread daemon
+    """
+    try:
+        pubsub = redis_sync.Redis.from_url(REDIS_URL).pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{REDIS_PROVIDER_CONFIG_CHANNEL: _on_provider_config_changed})
+        return pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+    except Exception as e:
+        logging.error(f"Could not start provider config listener: {e}")
+        return None
+
+
+def _smtp_sender_class():
+    """
+    Importa SMTPSender bajo demanda
+    """
+    global _SMTP_SENDER_CLS
+    
+    if _SMTP_SENDER_CLS is None:
+        from .smtp_sender import SMTPSender
+        _SMTP_SENDER_CLS = SMTPSender
+    return _SMTP_SENDER_CLS
+
+
+def _api_sender_class():
+    """
+    Importa APISender bajo demanda
+    """
+    global _API_SENDER_CLS
+    
+    if _API_SENDER_CLS is None:
+        from .api_sender import APISender
+        _API_SENDER_CLS = APISender
+    return _API_SENDER_CLS
+
+
+def _twilio_service_class():
+    """
+    Importa TwilioService bajo demanda
+    """
+    global _TWILIO_SERVICE_CLS
+    
+    if _TWILIO_SERVICE_CLS is None:
+        from services.twilio_service import TwilioService
+        _TWILIO_SERVICE_CLS = TwilioService
+    return _TWILIO_SERVICE_CLS
+
+
+def _render_template_func():
+    """
+    Importa render_template (template_renderer) bajo demanda
+    """
+    global _RENDER_TEMPLATE
+    
+    if _RENDER_TEMPLATE is None:
+        from services.template_renderer import render_template
+        _RENDER_TEMPLATE = render_template
+    return _RENDER_TEMPLATE
+
+
+async def _close_async_resources():
+    """
+    Cierra clientes async que viven en el loop del worker
+    """
+    # Solo los senders que se llegaron a usar en este proceso
+    if _API_SENDER_CLS is not None:
+        await _API_SENDER_CLS.close_all()
+    if _SMTP_SENDER_CLS is not None:
+        _SMTP_SENDER_CLS.close_all()
+    await get_audit_writer().close()
+    await close_redis_client()
+
+
+@worker_process_init.connect
+def init_worker_loop(**kwargs):
+    """
+    Crea el event loop y el listener de configuración al iniciar cada proceso worker
+    """
+    global _CONFIG_LISTENER
+    
+    # Loops creados fuera de _get_worker_loop en el proceso (librerías, asyncio.run) también usan uvloop
+    if UVLOOP_AVAILABLE:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    
+    _get_worker_loop()
+    _warm_provider_config_cache()
+    _CONFIG_LISTENER = _start_provider_config_listener()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_loop(**kwargs):
+    """
+    Libera conexiones y cierra el event loop al terminar el proceso worker
+    """
+    global _LOOP, _CONFIG_LISTENER
+    
+    if _CONFIG_LISTENER is not None:
+        _CONFIG_LISTENER.stop()
+        _CONFIG_LISTENER = None
+    
+    if _LOOP is None or _LOOP.is_closed():
+        return
+    
+    try:
+        # Escrituras en segundo plano pendientes: se completan antes de cerrar Redis
+        if _BACKGROUND:
+            _LOOP.run_until_complete(asyncio.gather(*_BACKGROUND, return_exceptions=True))
+        _LOOP.run_until_complete(_close_async_resources())
+        
+        # Tareas sueltas que quedaron en el loop (p.ej. flushers, callbacks de httpx)
+        pending = [task for task in asyncio.all_tasks(_LOOP) if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            _LOOP.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        _LOOP.run_until_complete(_LOOP.shutdown_asyncgens())
+        # Thread pool por defecto del loop (asyncio.to_thread: render de templates)
+        _LOOP.run_until_complete(_LOOP.shutdown_default_executor())
+    except Exception as e:
+        logging.error(f"Error closing worker async resources: {e}")
+    finally:
+        asyncio.set_event_loop(None)
+        _LOOP.close()
+        _LOOP = None
+
 
 class NotificationTask(Task):
     """
@@ -47,27 +335,33 @@ class NotificationTask(Task):
     bind=True,
     base=NotificationTask,
     name="send_notification",
+    ignore_result=True,
     max_retries=MAX_RETRIES,
     default_retry_delay=60,
-    retry_backoff=RETRY_BACKOFF,
+    # Política de backoff (la aplica _retry_countdown al reintentar desde la tarea)
+    retry_backoff=_RETRY_BACKOFF_FACTOR,
+    retry_backoff_max=_RETRY_BACKOFF_MAX,
+    retry_jitter=True,
+    # Límite suave antes del hard kill: deja registrar el timeout en Redis/MySQL
+    soft_time_limit=CELERY_TASK_TIMEOUT - 5,
     time_limit=CELERY_TASK_TIMEOUT
 )
 def send_notification_task(self, payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Tarea principal para envío de notificaciones - SYNC wrapper
     """
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
     try:
-        return loop.run_until_complete(_send_notification_async(self, payload))
-    finally:
-        loop.close()
+        return _run_async(_run_notification(self, payload))
+    except SoftTimeLimitExceeded:
+        _run_async(_record_task_timeout(self, payload))
+        raise
 
 
 @celery_app.task(
     bind=True,
     base=NotificationTask,
     name="send_test_notification",
+    ignore_result=True,
     max_retries=1,
     time_limit=120
 )
@@ -75,22 +369,176 @@ def send_test_notification_task(self, payload: Dict[str, Any]) -> Dict[str, Any]
     """
     Tarea para envío de notificaciones de prueba - SYNC wrapper
     """
-    payload = dict(payload or {})
-    payload.setdefault("provider", payload.get("provider") or "smtp_primary")
-    payload.setdefault("message_id", payload.get("message_id") or f"test-{datetime.utcnow().timestamp()}")
+    # El payload llega recién deserializado por Celery: se completa en el lugar, sin copia
+    payload = payload or {}
+    payload["provider"] = payload.get("provider") or "smtp_primary"
+    payload["message_id"] = payload.get("message_id") or f"test-{time.time()}"
     
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    return _run_async(_run_notification(self, payload))
+
+
+@celery_app.task(
+    bind=True,
+    base=NotificationTask,
+    name="send_notification_batch",
+    ignore_result=True,
+    acks_late=True,
+    # Mismos límites que send_notification: el timeout se registra por payload
+    soft_time_limit=CELERY_TASK_TIMEOUT - 5,
+    time_limit=CELERY_TASK_TIMEOUT
+)
+def send_notification_batch(self, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Envía un lote de notificaciones en una sola tarea - SYNC wrapper
+    Un solo ACK de broker para N mensajes; comparte loop, conexiones y caches
+    """
+    finished: Set[int] = set()
     try:
-        return loop.run_until_complete(_send_notification_async(self, payload))
-    finally:
-        loop.close()
+        return _run_async(_send_notification_batch_async(self, payloads, finished))
+    except SoftTimeLimitExceeded:
+        pending = [payload for index, payload in enumerate(payloads) if index not in finished]
+        _run_async(_record_batch_timeout(self, pending))
+        raise
+
+
+def enqueue_notification_batches(
+    payloads: List[Dict[str, Any]],
+    batch_size: int = CELERY_BATCH_SIZE
+) -> List[str]:
+    """
+    Encola payloads como tareas send_notification_batch agrupadas por proveedor
+    Cada lote usa un solo proveedor: sus envíos comparten la misma conexión
+    SMTP / cliente HTTP del worker
+    
+    Returns:
+        IDs de las tareas Celery creadas
+    """
+    by_provider: Dict[str, List[Dict[str, Any]]] = {}
+    for payload in payloads:
+        by_provider.setdefault(payload.get("provider") or "", []).append(payload)
+    
+    task_ids = []
+    for provider_payloads in by_provider.values():
+        for i in range(0, len(provider_payloads), batch_size):
+            result = send_notification_batch.apply_async(args=(provider_payloads[i:i + batch_size],))
+            task_ids.append(result.id)
+    
+    return task_ids
+
+
+@celery_app.task(
+    name="send_notification_bulk",
+    ignore_result=True
+)
+def send_notification_bulk(payloads: List[Dict[str, Any]]) -> int:
+    """
+    Reparte una lista de payloads en tareas send_notification individuales
+    Un solo mensaje desde el caller; el fan-out se publica como group con un
+    único producer (una conexión al broker para todo el lote)
+    """
+    if not payloads:
+        return 0
+    
+    with celery_app.producer_or_acquire() as producer:
+        group(send_notification_task.s(payload) for payload in payloads).apply_async(
+            producer=producer
+        )
+    
+    logging.info(f"Bulk fan-out: {len(payloads)} notifications enqueued")
+    return len(payloads)
+
+
+class _BatchItemTask:
+    """
+    Contexto de tarea para un payload dentro de un lote
+    Los reintentos se re-encolan como send_notification individuales
+    (reintentar la tarea batch reenviaría el lote completo)
+    """
+    
+    def __init__(self, batch_task: Task, payload: Dict[str, Any]):
+        # Intento actual del payload: el del lote (un lote re-entregado reprocesa sus payloads)
+        self.request = SimpleNamespace(
+            id=batch_task.request.id,
+            retries=batch_task.request.retries or 0
+        )
+        self.soft_time_limit = batch_task.soft_time_limit
+        self.payload = payload
+    
+    def retry(self, countdown: Optional[int] = None, exc: Optional[Exception] = None, **kwargs) -> Retry:
+        # El reintento individual continúa la cuenta del payload (max_retries de send_notification)
+        send_notification_task.apply_async(
+            args=(self.payload,),
+            countdown=countdown,
+            retries=self.request.retries + 1
+        )
+        return Retry(exc=exc, when=countdown)
 
 
 # -------------------------
 # Funciones async internas
 # -------------------------
 
+async def _send_notification_batch_async(
+    self,
+    payloads: List[Dict[str, Any]],
+    finished: Set[int]
+) -> Dict[str, Any]:
+    """
+    Ejecuta cada payload del lote con concurrencia acotada
+    Los índices de los payloads terminados se agregan a finished; ante
+    SoftTimeLimitExceeded el wrapper registra el timeout de los restantes
+    """
+    semaphore = asyncio.Semaphore(CELERY_BATCH_CONCURRENCY)
+    
+    async def run_one(index: int, payload: Dict[str, Any]):
+        async with semaphore:
+            try:
+                result = await _run_notification(_BatchItemTask(self, payload), payload)
+            except SoftTimeLimitExceeded:
+                raise
+            except Exception as exc:
+                # Retry o fallo definitivo: ya registrados por _send_notification_async
+                result = exc
+            finished.add(index)
+            return result
+    
+    tasks = [asyncio.ensure_future(run_one(index, payload)) for index, payload in enumerate(payloads)]
+    try:
+        results = await asyncio.gather(*tasks)
+    except SoftTimeLimitExceeded:
+        # Cortar el resto del lote: el wrapper registra el timeout de los pendientes
+        for task in tasks:
+            task.cancel()
+        raise
+    
+    retried = sum(1 for r in results if isinstance(r, Retry))
+    failed = sum(1 for r in results if isinstance(r, Exception) and not isinstance(r, Retry))
+    
+    summary = {
+        "batch_task_id": self.request.id,
+        "total": len(payloads),
+        "sent": len(payloads) - retried - failed,
+        "retried": retried,
+        "failed": failed
+    }
+    logging.info(f"Notification batch processed: {summary}")
+    return summary
+
+
+async def _record_batch_timeout(self, payloads: List[Dict[str, Any]]):
+    """
+    Registra el timeout de cada payload del lote que no alcanzó a terminar
+    """
+    logging.error(f"Notification batch {self.request.id} timed out with {len(payloads)} pending notifications")
+    results = await asyncio.gather(
+        *(_record_task_timeout(_BatchItemTask(self, payload), payload) for payload in payloads),
+        return_exceptions=True
+    )
+    for payload, result in zip(payloads, results):
+        if isinstance(result, Exception):
+            logging.error(f"Batch timeout record error for {payload.get('message_id')}: {result}")
+
+
 async def _send_notification_async_old(self, payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     ✅ CORREGIDO: Lógica async para envío de notificaciones (Email + Twilio)
@@ -231,7 +679,7 @@ async def _send_notification_async_old(self, payload: Dict[str, Any]) -> Dict[st
 
     except Exception as exc:
         # Manejo de errores - igual que antes pero con notification_type
-        should_retry = _should_retry_error(exc, self.request.retries)
+        should_retry = _should_retry_error(exc)
 
         error_info = {
             "error_type": type(exc).__name__,
@@ -261,7 +709,7 @@ async def _send_notification_async_old(self, payload: Dict[str, Any]) -> Dict[st
             except Exception as db_error:
                 logging.error(f"Database retry update error for {message_id}: {db_error}")
 
-            retry_delay = (RETRY_BACKOFF ** max(1, self.request.retries)) * 60
+            retry_delay = _retry_countdown(self.request.retries)
             next_retry_time = (datetime.utcnow() + timedelta(seconds=retry_delay)).isoformat()
 
             await _log_task_retry(
@@ -497,7 +945,7 @@ async def _send_notification_async_old2(self, payload: Dict[str, Any]) -> Dict[s
         processing_time_ms = int((end_time - start_time).total_seconds() * 1000)
         
         # Manejo de errores - igual que antes pero con notification_type
-        should_retry = _should_retry_error(exc, self.request.retries)
+        should_retry = _should_retry_error(exc)
 
         error_info = {
             "error_type": type(exc).__name__,
@@ -529,7 +977,7 @@ async def _send_notification_async_old2(self, payload: Dict[str, Any]) -> Dict[s
             except Exception as db_error:
                 logging.error(f"Database retry update error for {message_id}: {db_error}")
 
-            retry_delay = (RETRY_BACKOFF ** max(1, self.request.retries)) * 60
+            retry_delay = _retry_countdown(self.request.retries)
             next_retry_time = (datetime.utcnow() + timedelta(seconds=retry_delay)).isoformat()
 
             await _log_task_retry(
@@ -622,9 +1070,13 @@ async def _send_notification_async(self, payload: Dict[str, Any]) -> Dict[str, A
     
     # Detectar tipo de notificación
     notification_type = payload.get("notification_type", "email")
+    nt_title = notification_type.title()
     
     # ✅ Métricas de tiempo de procesamiento
-    start_time = datetime.utcnow()
+    # Reloj monotónico para duraciones; datetime solo para los timestamps ISO
+    start_clock = time.monotonic()
+    start_iso = datetime.utcnow().isoformat()
+    _set_task_clock(start_iso)
     
     log_extra = {
         "message_id": message_id,
@@ -633,10 +1085,12 @@ async def _send_notification_async(self, payload: Dict[str, Any]) -> Dict[str, A
         "provider": provider,
         "notification_type": notification_type
     }
+    # Escritura MySQL de "processing": corre mientras se envía (ver abajo)
+    start_write = None
 
     try:
         # Log de arranque y estado inicial
-        await _log_task_start(message_id, payload, self.request.id)
+        await _log_task_start(message_id, payload, self.request.id, nt_title)
         await _log_task_event(
             message_id=message_id,
             event="processing_started",
@@ -649,23 +1103,29 @@ async def _send_notification_async(self, payload: Dict[str, Any]) -> Dict[str, A
             status="processing",
             celery_task_id=self.request.id,
             additional_info={
-                "started_at": start_time.isoformat(),
+                "started_at": start_iso,
                 "provider": provider,
                 "notification_type": notification_type
             },
         )
 
-        # Actualizar estado en MySQL a processing
-        try:
-            DatabaseService.update_notification_status(
+        # Actualizar estado en MySQL a processing sin bloquear el envío; se espera
+        # antes de las escrituras finales para que "processing" no pise el estado final
+        start_write = asyncio.ensure_future(_gather_sinks(
+            message_id,
+            "start",
+            asyncio.to_thread(
+                DatabaseService.update_notification_status,
                 message_id=message_id,
                 status="processing"
             )
-            DatabaseService.add_notification_log(
+        ))
+        try:
+            _submit_notification_log(
                 message_id=message_id,
                 event_type="processing_started",
                 event_status="info",
-                event_message=f"{notification_type.title()} notification processing started",
+                event_message=f"{nt_title} notification processing started",
                 component="celery",
                 provider=provider,
                 details_json={"celery_task_id": self.request.id, "notification_type": notification_type}
@@ -674,7 +1134,7 @@ async def _send_notification_async(self, payload: Dict[str, Any]) -> Dict[str, A
             logging.error(f"Database update error for {message_id}: {db_error}")
 
         # Config del proveedor
-        provider_config = get_provider_config(provider)
+        provider_config = _get_provider_config_cached(provider)
         if not provider_config:
             raise ValueError(f"Provider configuration not found: {provider}")
 
@@ -689,73 +1149,21 @@ async def _send_notification_async(self, payload: Dict[str, Any]) -> Dict[str, A
 
         # ✅ Calcular tiempo de procesamiento
         end_time = datetime.utcnow()
-        processing_time_ms = int((end_time - start_time).total_seconds() * 1000)
-
-        # Actualizar estado en MySQL a sent
-        try:
-            DatabaseService.update_notification_status(
-                message_id=message_id,
-                status="sent",
-                sent_at=end_time
-            )
-            DatabaseService.add_notification_log(
-                message_id=message_id,
-                event_type=f"{notification_type}_sent",
-                event_status="success",
-                event_message=f"{notification_type.title()} sent successfully",
-                component="celery",
-                provider=provider,
-                processing_time_ms=processing_time_ms,
-                details_json={
-                    "provider_response": send_result.get("provider_response", {}),
-                    "channel": send_result.get("channel"),
-                    "processing_time_ms": processing_time_ms
-                }
-            )
-            
-            # ✅ Actualizar estadísticas de proveedor (ÉXITO)
-            DatabaseService.update_provider_stats(
-                provider=provider,
-                stat_type="sent",
-                processing_time_ms=processing_time_ms
-            )
-            
-        except Exception as db_error:
-            logging.error(f"Database success update error for {message_id}: {db_error}")
-
-        # Logs/estado de éxito
-        await _log_task_event(
-            message_id=message_id,
-            event="sent_successfully",
-            message=f"{notification_type.title()} sent successfully",
-            details={
-                "provider": provider,
-                "provider_response": send_result.get("provider_response", {}),
-                "sent_at": end_time.isoformat(),
-                "notification_type": notification_type,
-                "processing_time_ms": processing_time_ms
-            },
-            celery_task_id=self.request.id,
-        )
-        
-        await _log_task_success(
+        end_iso = end_time.isoformat()
+        _set_task_clock(end_iso)
+        processing_time_ms = int((time.monotonic() - start_clock) * 1000)
+
+        # Cierre de la tarea: un registro por destino (MySQL y Redis)
+        await start_write
+        await _finalize_task(
+            self,
             message_id=message_id,
-            provider_response=send_result,
-            celery_task_id=self.request.id,
-            delivery_time=processing_time_ms / 1000.0
-        )
-        
-        await _update_task_status(
-            message_id=message_id,
-            status="success",
-            celery_task_id=self.request.id,
-            additional_info={
-                "completed_at": end_time.isoformat(),
-                "provider_response": send_result,
-                "final_status": "delivered",
-                "notification_type": notification_type,
-                "processing_time_ms": processing_time_ms
-            },
+            provider=provider,
+            notification_type=notification_type,
+            send_result=send_result,
+            end_time=end_time,
+            processing_time_ms=processing_time_ms,
+            nt_title=nt_title
         )
 
         result = {
@@ -763,21 +1171,30 @@ async def _send_notification_async(self, payload: Dict[str, Any]) -> Dict[str, A
             "message_id": message_id,
             "provider": provider,
             "notification_type": notification_type,
-            "sent_at": end_time.isoformat(),
+            "sent_at": end_iso,
             "provider_response": send_result,
             "processing_time_ms": processing_time_ms
         }
 
-        logging.info(f"{notification_type.title()} notification sent successfully", extra=log_extra)
+        logging.info(f"{nt_title} notification sent successfully", extra=log_extra)
         return result
 
+    except SoftTimeLimitExceeded:
+        # Sin reintento: el wrapper síncrono registra el timeout (_record_task_timeout)
+        raise
+
     except Exception as exc:
         # Calcular tiempo hasta el fallo
         end_time = datetime.utcnow()
-        processing_time_ms = int((end_time - start_time).total_seconds() * 1000)
+        end_iso = end_time.isoformat()
+        _set_task_clock(end_iso)
+        processing_time_ms = int((time.monotonic() - start_clock) * 1000)
+        
+        if start_write is not None:
+            await start_write
         
         # Manejo de errores
-        should_retry = _should_retry_error(exc, self.request.retries)
+        should_retry = _should_retry_error(exc)
 
         error_info = {
             "error_type": type(exc).__name__,
@@ -789,14 +1206,9 @@ async def _send_notification_async(self, payload: Dict[str, Any]) -> Dict[str, A
         }
 
         if should_retry and self.request.retries < MAX_RETRIES:
-            # Log de retry en MySQL
+            # Log de retry en MySQL (group commit)
             try:
-                DatabaseService.update_notification_status(
-                    message_id=message_id,
-                    status="failed",
-                    retry_count=self.request.retries + 1
-                )
-                DatabaseService.add_notification_log(
+                _submit_notification_log(
                     message_id=message_id,
                     event_type="retry_scheduled",
                     event_status="warning",
@@ -809,101 +1221,307 @@ async def _send_notification_async(self, payload: Dict[str, Any]) -> Dict[str, A
             except Exception as db_error:
                 logging.error(f"Database retry update error for {message_id}: {db_error}")
 
-            retry_delay = (RETRY_BACKOFF ** max(1, self.request.retries)) * 60
-            next_retry_time = (datetime.utcnow() + timedelta(seconds=retry_delay)).isoformat()
+            retry_delay = _retry_countdown(self.request.retries)
+            next_retry_time = (end_time + timedelta(seconds=retry_delay)).isoformat()
 
-            await _log_task_retry(
+            async def _write_retry_redis():
+                await _log_task_retry(
+                    message_id=message_id,
+                    retry_count=self.request.retries + 1,
+                    next_retry_time=next_retry_time,
+                    celery_task_id=self.request.id,
+                )
+                await _update_task_status(
+                    message_id=message_id,
+                    status="retry",
+                    celery_task_id=self.request.id,
+                    additional_info={
+                        "error": error_info,
+                        "retry_scheduled_at": end_iso,
+                        "next_retry_eta": next_retry_time,
+                        "notification_type": notification_type,
+                        "processing_time_ms": processing_time_ms
+                    },
+                )
+
+            # Estado MySQL y Redis (flush anticipado del retry) en paralelo
+            await _gather_sinks(
+                message_id,
+                "retry",
+                asyncio.to_thread(
+                    DatabaseService.update_notification_status,
+                    message_id=message_id,
+                    status="failed",
+                    retry_count=self.request.retries + 1
+                ),
+                _write_retry_redis()
+            )
+            logging.warning(f"Retrying {notification_type} task in {retry_delay}s", extra=log_extra)
+            raise self.retry(countdown=retry_delay, exc=exc)
+
+        failure_message = f"{nt_title} notification failed permanently: {exc}"
+
+        # Fallo definitivo - log MySQL (group commit)
+        try:
+            _submit_notification_log(
                 message_id=message_id,
-                retry_count=self.request.retries + 1,
-                next_retry_time=next_retry_time,
+                event_type="failed_permanently",
+                event_status="error",
+                event_message=failure_message,
+                component="celery",
+                provider=provider,
+                processing_time_ms=processing_time_ms,
+                details_json=error_info
+            )
+        except Exception as db_error:
+            logging.error(f"Database failure update error for {message_id}: {db_error}")
+
+        async def _write_failure_redis():
+            await _log_task_failure(
+                message_id=message_id,
+                error=exc,
+                celery_task_id=self.request.id,
+                retry_count=self.request.retries,
+                will_retry=False,
+            )
+            await _log_task_event(
+                message_id=message_id,
+                event="failed_permanently",
+                message=failure_message,
+                details=error_info,
                 celery_task_id=self.request.id,
             )
             await _update_task_status(
                 message_id=message_id,
-                status="retry",
+                status="failed",
                 celery_task_id=self.request.id,
                 additional_info={
+                    "failed_at": end_iso,
                     "error": error_info,
-                    "retry_scheduled_at": datetime.utcnow().isoformat(),
-                    "next_retry_eta": next_retry_time,
+                    "final_status": "failed",
                     "notification_type": notification_type,
                     "processing_time_ms": processing_time_ms
                 },
             )
-            logging.warning(f"Retrying {notification_type} task in {retry_delay}s", extra=log_extra)
-            raise self.retry(countdown=retry_delay, exc=exc)
 
-        # Fallo definitivo - actualizar estadísticas de proveedor (FALLO)
-        try:
-            DatabaseService.update_notification_status(
+        # Estado y estadísticas de proveedor (FALLO) en MySQL y Redis en paralelo
+        await _gather_sinks(
+            message_id,
+            "failure",
+            asyncio.to_thread(
+                DatabaseService.update_notification_status,
                 message_id=message_id,
                 status="failed"
-            )
-            DatabaseService.add_notification_log(
-                message_id=message_id,
-                event_type="failed_permanently",
-                event_status="error",
-                event_message=f"{notification_type.title()} notification failed permanently: {str(exc)}",
-                component="celery",
-                provider=provider,
-                processing_time_ms=processing_time_ms,
-                details_json=error_info
-            )
-            
-            # ✅ Actualizar estadísticas de proveedor (FALLO)
-            DatabaseService.update_provider_stats(
+            ),
+            asyncio.to_thread(
+                DatabaseService.update_provider_stats,
                 provider=provider,
                 stat_type="failed",
                 processing_time_ms=processing_time_ms
-            )
-            
-        except Exception as db_error:
-            logging.error(f"Database failure update error for {message_id}: {db_error}")
+            ),
+            _write_failure_redis()
+        )
+        logging.error(f"{nt_title} notification failed permanently", extra=log_extra, exc_info=True)
+        raise
+    
 
-        await _log_task_failure(
+async def _record_task_timeout(self, payload: Dict[str, Any]):
+    """
+    Registra el timeout de una notificación (soft_time_limit) antes del hard kill
+    """
+    message_id = payload.get("message_id")
+    provider = payload.get("provider")
+    error_info = {
+        "error_type": "SoftTimeLimitExceeded",
+        "error_message": f"Task exceeded soft time limit ({self.soft_time_limit}s)",
+        "retry_count": self.request.retries,
+        "notification_type": payload.get("notification_type", "email")
+    }
+    
+    try:
+        await asyncio.to_thread(
+            DatabaseService.update_notification_status,
             message_id=message_id,
-            error=exc,
-            celery_task_id=self.request.id,
-            retry_count=self.request.retries,
-            will_retry=False,
+            status="failed"
         )
+        # Group commit como el resto de logs: _run_async lo drena antes de retornar
+        # (dentro de la ventana entre soft y hard time limit)
+        _submit_notification_log(
+            message_id=message_id,
+            event_type="task_timeout",
+            event_status="error",
+            event_message=error_info["error_message"],
+            component="celery",
+            provider=provider,
+            details_json=error_info
+        )
+    except Exception as db_error:
+        logging.error(f"Database timeout update error for {message_id}: {db_error}")
+    
+    # Evento + estado en un solo flush (antes del hard kill, no en segundo plano)
+    async with TaskLogBuffer(message_id, self.request.id) as buffer:
         await _log_task_event(
             message_id=message_id,
-            event="failed_permanently",
-            message=f"{notification_type.title()} notification failed permanently: {exc}",
+            event="task_timeout",
+            message=error_info["error_message"],
+            level="ERROR",
             details=error_info,
             celery_task_id=self.request.id,
         )
         await _update_task_status(
             message_id=message_id,
-            status="failed",
+            status="timeout",
             celery_task_id=self.request.id,
             additional_info={
-                "failed_at": end_time.isoformat(),
+                "failed_at": datetime.utcnow().isoformat(),
                 "error": error_info,
-                "final_status": "failed",
+                "final_status": "timeout"
+            },
+        )
+        await buffer.flush()
+
+
+async def _finalize_task(
+    self,
+    message_id: str,
+    provider: str,
+    notification_type: str,
+    send_result: Dict[str, Any],
+    end_time: datetime,
+    processing_time_ms: int,
+    nt_title: str
+):
+    """
+    Registra el envío exitoso: estado + estadísticas + log en MySQL y un
+    solo evento + estado final en Redis (sin eventos duplicados)
+    """
+    end_iso = end_time.isoformat()
+    provider_response = send_result.get("provider_response", {})
+    success_message = f"{nt_title} sent successfully"
+    
+    # Log MySQL al group commit (no bloquea)
+    try:
+        _submit_notification_log(
+            message_id=message_id,
+            event_type=f"{notification_type}_sent",
+            event_status="success",
+            event_message=success_message,
+            component="celery",
+            provider=provider,
+            processing_time_ms=processing_time_ms,
+            details_json={
+                "provider_response": provider_response,
+                "channel": send_result.get("channel"),
+                "processing_time_ms": processing_time_ms
+            }
+        )
+    except Exception as db_error:
+        logging.error(f"Database success log error for {message_id}: {db_error}")
+    
+    async def _write_redis():
+        # Un evento de éxito (la respuesta completa del proveedor va en el estado)
+        await _log_task_event(
+            message_id=message_id,
+            event="sent_successfully",
+            message=success_message,
+            details={
+                "provider": provider,
+                "provider_response": provider_response,
+                "sent_at": end_iso,
+                "notification_type": notification_type,
+                "processing_time_ms": processing_time_ms,
+                "delivery_time_seconds": processing_time_ms / 1000.0,
+                "success": True
+            },
+            celery_task_id=self.request.id,
+        )
+        await _update_task_status(
+            message_id=message_id,
+            status="success",
+            celery_task_id=self.request.id,
+            additional_info={
+                "completed_at": end_iso,
+                "provider_response": send_result,
+                "final_status": "delivered",
                 "notification_type": notification_type,
                 "processing_time_ms": processing_time_ms
             },
         )
-        logging.error(f"{notification_type.title()} notification failed permanently", extra=log_extra, exc_info=True)
-        raise
     
+    # MySQL (estado y estadísticas, tablas independientes) y Redis en paralelo
+    await _gather_sinks(
+        message_id,
+        "success",
+        asyncio.to_thread(
+            DatabaseService.update_notification_status,
+            message_id=message_id,
+            status="sent",
+            sent_at=end_time
+        ),
+        asyncio.to_thread(
+            DatabaseService.update_provider_stats,
+            provider=provider,
+            stat_type="sent",
+            processing_time_ms=processing_time_ms
+        ),
+        _write_redis()
+    )
+
+
+async def _gather_sinks(message_id: str, stage: str, *writes):
+    """
+    Ejecuta escrituras independientes (MySQL / Redis) en paralelo
+    Un fallo se registra sin cancelar ni abortar las demás
+    """
+    results = await asyncio.gather(*writes, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logging.error(f"Write error on {stage} for {message_id}: {result}")
+
+
+def _submit_notification_log(**row):
+    """
+    Encola un log de notificación en el group commit de auditoría (AuditWriter)
+    No bloquea el loop: se inserta en lote con los logs de otras tareas
+    """
+    writer = get_audit_writer()
+    if writer.submit(row) is None:
+        writer.submit_background(row)
 
-def _should_retry_error(exc: Exception, current_retries: int) -> bool:
+
+def _should_retry_error(exc: Exception) -> bool:
     """
-    Heurística simple para decidir reintentos
+    Heurística simple para decidir reintentos: solo errores transitorios
+    (el caller además limita a MAX_RETRIES); los permanentes fallan en el acto
+    Chequeos ordenados de más barato a más caro: str(exc) solo se construye
+    cuando el error no es transitorio por tipo/código
     """
-    transient_errors = (
-        ConnectionError,
-        TimeoutError,
+    return (
+        isinstance(exc, _TRANSIENT_EXC)
+        or _error_status_code(exc) in _TRANSIENT_STATUS_CODES
+        or _TRANSIENT_RE.search(str(exc)) is not None
     )
-    msg = str(exc).lower()
-    if isinstance(exc, transient_errors):
-        return True
-    if "timeout" in msg or "temporarily" in msg or "rate limit" in msg:
-        return True
-    return current_retries < MAX_RETRIES
+
+
+def _retry_countdown(retries: int) -> int:
+    """
+    Countdown del próximo reintento según la política de send_notification
+    Mismo resultado que el autoretry de Celery (backoff exponencial con tope y
+    full jitter), con el tope por intento tomado de _RETRY_COUNTDOWN_TABLE
+    """
+    countdown = _RETRY_COUNTDOWN_TABLE[min(retries, len(_RETRY_COUNTDOWN_TABLE) - 1)]
+    return random.randrange(countdown + 1)
+
+
+def _error_status_code(exc: Exception) -> Optional[int]:
+    """
+    Código HTTP/SMTP asociado a la excepción, si lo hay
+    """
+    code = getattr(exc, "smtp_code", None) or getattr(exc, "status_code", None)
+    if code is None:
+        response = getattr(exc, "response", None)
+        code = getattr(response, "status_code", None)
+    return code
 
 
 async def _prepare_email_content_async(payload: Dict[str, Any]) -> Dict[str, Optional[str]]:
@@ -922,8 +1540,7 @@ async def _prepare_email_content_async(payload: Dict[str, Any]) -> Dict[str, Opt
     if template_id:
         try:
             # Renderizar template
-            from services.template_renderer import render_template
-            rendered = await render_template(
+            rendered = await _render_template_func()(
                 template_id=template_id,
                 variables=variables
             )
@@ -949,13 +1566,11 @@ async def _send_twilio_sms(payload: Dict[str, Any], provider_config: Dict[str, A
     to_numbers = payload.get("to", [])
     body_text = payload.get("body_text", "")
     message_id = payload.get("message_id")
-    start_time = datetime.utcnow()
+    start_clock = time.monotonic()
     
     try:
         # ✅ CORREGIDO: Usar TwilioService con provider_config
-        from services.twilio_service import TwilioService
-        
-        twilio_service = TwilioService(provider_config)
+        twilio_service = _twilio_service_class().get(provider_config)
         
         # Enviar a cada número (Twilio requiere envíos individuales)
         results = []
@@ -982,7 +1597,7 @@ async def _send_twilio_sms(payload: Dict[str, Any], provider_config: Dict[str, A
                 })
         
         # Calcular tiempo total
-        processing_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+        processing_time_ms = int((time.monotonic() - start_clock) * 1000)
         
         return {
             "success": successful_sends > 0,
@@ -1003,7 +1618,7 @@ async def _send_twilio_sms(payload: Dict[str, Any], provider_config: Dict[str, A
         }
         
     except Exception as e:
-        processing_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+        processing_time_ms = int((time.monotonic() - start_clock) * 1000)
         logging.error(f"Twilio SMS service failed: {e}")
         
         return {
@@ -1036,13 +1651,11 @@ async def _send_twilio_whatsapp(payload: Dict[str, Any], provider_config: Dict[s
     #template_id = payload.get("template_id")
     template_id=False
     template_vars = payload.get("vars", {})
-    start_time = datetime.utcnow()
+    start_clock = time.monotonic()
     
     try:
         # ✅ CORREGIDO: Usar TwilioService con provider_config
-        from services.twilio_service import TwilioService
-        
-        twilio_service = TwilioService(provider_config)
+        twilio_service = _twilio_service_class().get(provider_config)
         
         # Enviar a cada número
         results = []
@@ -1081,7 +1694,7 @@ async def _send_twilio_whatsapp(payload: Dict[str, Any], provider_config: Dict[s
                 })
         
         # Calcular tiempo total
-        processing_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+        processing_time_ms = int((time.monotonic() - start_clock) * 1000)
         
         return {
             "success": successful_sends > 0,
@@ -1103,7 +1716,7 @@ async def _send_twilio_whatsapp(payload: Dict[str, Any], provider_config: Dict[s
         }
         
     except Exception as e:
-        processing_time_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+        processing_time_ms = int((time.monotonic() - start_clock) * 1000)
         logging.error(f"Twilio WhatsApp service failed: {e}")
         
         return {
@@ -1133,16 +1746,12 @@ async def _send_twilio_async(payload: Dict[str, Any], provider_config: Dict[str,
     provider_type = provider_config.get("provider_type", "")
     
     try:
-        if provider_type == "twilio_sms":
-            result = await _send_twilio_sms(payload, provider_config)
-            return {"channel": "twilio_sms", **result}
-            
-        elif provider_type == "twilio_whatsapp":
-            result = await _send_twilio_whatsapp(payload, provider_config)
-            return {"channel": "twilio_whatsapp", **result}
-            
-        else:
+        send = _TWILIO_SENDERS.get(provider_type)
+        if send is None:
             raise ValueError(f"Unsupported Twilio provider type: {provider_type}")
+        
+        result = await send(payload, provider_config)
+        return {"channel": provider_type, **result}
             
     except Exception as e:
         logging.error(f"Twilio sending failed: {e}")
@@ -1171,43 +1780,262 @@ async def _send_email_async(
 
     channel = (provider_config.get("type") or "").lower()
 
-    if channel == "smtp":
-        sender = SMTPSender(provider_config)
-        result = await sender.send_email(
-            to=to,
-            subject=subject,
-            body_text=body_text,
-            body_html=body_html,
-            cc=cc,
-            bcc=bcc,
-            attachments=attachments,
-            message_id=message_id,
-            custom_headers=custom_headers,
-        )
-        return {"channel": "smtp", **result}
-
-    elif channel == "api":
-        sender = APISender(provider_config)
-        result = await sender.send_email(
-            to=to,
-            subject=subject,
-            body_text=body_text,
-            body_html=body_html,
-            cc=cc,
-            bcc=bcc,
-            attachments=attachments,
-            message_id=message_id,
-            custom_headers=custom_headers,
-        )
-        return {"channel": "api", **result}
+    sender_class = _EMAIL_SENDER_CLASSES.get(channel)
+    if sender_class is None:
+        raise ValueError(f"Unsupported email provider type: {channel}")
+
+    # Instancia compartida por proveedor: la conexión SMTP / el cliente HTTP
+    # (keep-alive) se mantiene entre tareas
+    sender = sender_class().get(provider_config)
+    result = await sender.send_email(
+        to=to,
+        subject=subject,
+        body_text=body_text,
+        body_html=body_html,
+        cc=cc,
+        bcc=bcc,
+        attachments=attachments,
+        message_id=message_id,
+        custom_headers=custom_headers,
+    )
+    return {"channel": channel, **result}
 
-    raise ValueError(f"Unsupported email provider type: {channel}")
+
+# Dispatch por tipo de proveedor (las clases de sender se importan bajo demanda)
+_EMAIL_SENDER_CLASSES = {
+    "smtp": _smtp_sender_class,
+    "api": _api_sender_class,
+}
+_TWILIO_SENDERS = {
+    "twilio_sms": _send_twilio_sms,
+    "twilio_whatsapp": _send_twilio_whatsapp,
+}
 
 
 # -------------------------
 # Logging helpers async - MANTENIDOS IGUAL
 # -------------------------
 
+# Buffer de logs/estado Redis activo para la tarea en curso (ver TaskLogBuffer)
+_LOG_BUFFER: contextvars.ContextVar[Optional["TaskLogBuffer"]] = contextvars.ContextVar(
+    "task_log_buffer", default=None
+)
+
+
+def _now_iso() -> str:
+    """
+    Timestamp ISO para logs/estado: el de la fase actual de la tarea si hay
+    buffer activo (un solo isoformat por fase), si no la hora actual
+    """
+    buffer = _LOG_BUFFER.get()
+    if buffer is not None and buffer.now_iso is not None:
+        return buffer.now_iso
+    return datetime.utcnow().isoformat()
+
+
+def _set_task_clock(now_iso: str):
+    """
+    Fija el timestamp de la fase actual en el buffer de la tarea
+    """
+    buffer = _LOG_BUFFER.get()
+    if buffer is not None:
+        buffer.now_iso = now_iso
+
+
+class TaskLogBuffer:
+    """
+    Acumula escrituras Redis de una tarea y las envía en un solo pipeline al terminar
+    
+    Mientras está activo, _log_task_event y _update_task_status encolan en
+    memoria en lugar de escribir. Al salir el estado se mezcla con el previo
+    en un script Lua (1 RTT atómico en vez de uno por llamada). Los estados
+    retry/failed fuerzan un flush anticipado; en éxito el flush final se agrupa
+    con el de otras tareas del loop y se completa antes de que _run_async retorne.
+    
+    Los eventos del ciclo de vida se escriben siempre junto al estado (el orden
+    de la lista sigue la línea de tiempo entre intentos); solo los eventos DEBUG,
+    que no son parte de ese ciclo, se difieren a la cola logs.
+    """
+    
+    def __init__(self, message_id: str, celery_task_id: str = None):
+        self.message_id = message_id
+        self.celery_task_id = celery_task_id
+        # Campos fijos de cada entrada de log de la tarea (se arman una vez)
+        self.log_base = {"message_id": message_id, "celery_task_id": celery_task_id}
+        self.log_entries = []
+        # Eventos DEBUG (no terminales): se persisten desde la cola logs
+        self.debug_entries = []
+        self.status_updates: Dict[str, Any] = {}
+        # Timestamp de la fase actual de la tarea (inicio / fin), ver _now_iso
+        self.now_iso: Optional[str] = None
+        self._token = None
+    
+    async def __aenter__(self):
+        self._token = _LOG_BUFFER.set(self)
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        _LOG_BUFFER.reset(self._token)
+        if exc_type is None:
+            # Éxito: el flush se agrupa con el de otras tareas concurrentes del loop
+            # (batch); _run_async lo espera antes de devolver la tarea a Celery
+            _schedule_flush(self)
+        else:
+            await self.flush()
+        return False
+    
+    def event(self, log_entry: Dict[str, Any]):
+        """Encola entrada de log"""
+        if log_entry.get("level") == "DEBUG":
+            self.debug_entries.append(dumps_log(log_entry))
+        else:
+            self.log_entries.append(dumps_log(log_entry))
+    
+    def status(self, updates: Dict[str, Any]):
+        """Encola actualización de estado (se mezcla con las anteriores)"""
+        self.status_updates.update(updates)
+    
+    async def flush(self):
+        """Escribe estado y logs acumulados en Redis"""
+        self._defer_debug_entries()
+        if not self.log_entries and not self.status_updates:
+            return
+        
+        try:
+            # Merge de estado + logs del ciclo de vida atómico en un round-trip
+            await log_event_and_status(
+                self.message_id,
+                status_updates=self.status_updates,
+                log_entries=self.log_entries,
+                defaults={
+                    "message_id": self.message_id,
+                    "celery_task_id": self.celery_task_id,
+                    "created_at": _now_iso()
+                }
+            )
+            
+        except Exception as e:
+            logging.error(f"Task log buffer flush failed for {self.message_id}: {e}")
+        
+        finally:
+            self.log_entries = []
+            self.status_updates = {}
+    
+    async def queue_flush(self, pipe):
+        """
+        Encola estado y logs acumulados en un pipeline Redis (flush en lote)
+        Los logs van en la misma llamada: ya se está fuera del camino crítico
+        """
+        self._defer_debug_entries()
+        try:
+            await log_event_and_status(
+                self.message_id,
+                status_updates=self.status_updates,
+                log_entries=self.log_entries,
+                defaults={
+                    "message_id": self.message_id,
+                    "celery_task_id": self.celery_task_id,
+                    "created_at": _now_iso()
+                },
+                client=pipe
+            )
+        finally:
+            self.log_entries = []
+            self.status_updates = {}
+    
+    def _defer_debug_entries(self):
+        """Publica los eventos DEBUG acumulados en la cola logs sin bloquear el loop"""
+        if self.debug_entries:
+            entries, self.debug_entries = self.debug_entries, []
+            _spawn_background(_publish_task_events(self.message_id, entries))
+
+
+def _schedule_flush(buffer: TaskLogBuffer):
+    """
+    Encola el flush de una tarea exitosa para el drenador en segundo plano
+    """
+    global _FLUSH_DRAINER
+    
+    if not buffer.log_entries and not buffer.status_updates:
+        buffer._defer_debug_entries()
+        return
+    
+    _PENDING_FLUSHES.append(buffer)
+    if _FLUSH_DRAINER is None or _FLUSH_DRAINER.done():
+        _FLUSH_DRAINER = _spawn_background(_drain_task_flushes())
+
+
+async def _drain_task_flushes():
+    """
+    Escribe los flushes pendientes en un solo pipeline Redis por lote
+    Sin espera: agrupa los que ya encolaron las tareas concurrentes del loop
+    (batch) mientras el pipeline anterior estaba en vuelo; termina con la cola vacía
+    """
+    while _PENDING_FLUSHES:
+        batch = _PENDING_FLUSHES[:_FLUSH_BATCH_SIZE]
+        del _PENDING_FLUSHES[:_FLUSH_BATCH_SIZE]
+        
+        try:
+            redis_client = await get_redis_client()
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for buffer in batch:
+                    await buffer.queue_flush(pipe)
+                await pipe.execute()
+        except Exception as e:
+            logging.error(f"Background task log flush failed for {len(batch)} tasks: {e}")
+
+
+async def _publish_task_events(message_id: str, log_entries: List[str]):
+    """
+    Publica logs no terminales en la cola logs (el publish síncrono corre en
+    un thread para no bloquear el loop); si falla se escriben inline
+    """
+    try:
+        await asyncio.to_thread(
+            persist_task_events.apply_async,
+            args=(message_id, log_entries),
+            queue="logs",
+            priority=9
+        )
+    except Exception as e:
+        logging.warning(f"Could not defer task logs for {message_id}, writing inline: {e}")
+        try:
+            await log_event_and_status(message_id, log_entries=log_entries)
+        except Exception as e:
+            logging.error(f"Task log write failed for {message_id}: {e}")
+
+
+async def _persist_task_events_async(message_id: str, log_entries) -> int:
+    """
+    Escribe en Redis un lote de logs diferidos de una tarea
+    """
+    # Mismo script que el flush de estado: XADD/LPUSH según el tipo de la clave
+    await log_event_and_status(message_id, log_entries=list(log_entries))
+    
+    return len(log_entries)
+
+
+@celery_app.task(
+    name="persist_task_events",
+    ignore_result=True,
+    acks_late=False
+)
+def persist_task_events(message_id: str, log_entries) -> int:
+    """
+    Tarea de baja prioridad (cola logs) que persiste logs de eventos de notificaciones
+    """
+    return _run_async(_persist_task_events_async(message_id, log_entries))
+
+
+async def _run_notification(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cuerpo común de send_notification y send_test_notification
+    Ejecuta la tarea con escrituras Redis agrupadas en un solo flush
+    (la tarea de prueba llama a esta corrutina directamente, sin re-despachar)
+    """
+    async with TaskLogBuffer(payload.get("message_id"), self.request.id):
+        return await _send_notification_async(self, payload)
+
 async def _log_task_event(
     message_id: str,
     event: str,
@@ -1217,45 +2045,63 @@ async def _log_task_event(
     celery_task_id: str = None
 ):
     """Log de evento de tarea en Redis"""
+    # Eventos DEBUG: solo se construyen y persisten con nivel DEBUG activo
+    if level == "DEBUG" and not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
+    
     try:
-        from utils.redis_client import get_redis_client, RedisHelper
-        from constants import REDIS_LOG_PREFIX
-
-        redis_client = await get_redis_client()
-        redis_helper = RedisHelper(redis_client)
-
-        log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "message_id": message_id,
-            "event": event,
-            "level": level,
-            "message": message,
-            "details": details or {},
-            "celery_task_id": celery_task_id
-        }
-
-        log_key = f"{REDIS_LOG_PREFIX}{message_id}"
-        await redis_helper.push_log(log_key, log_entry, max_entries=500)
+        details = details or {}
+        buffer = _LOG_BUFFER.get()
+        if (buffer is not None and buffer.message_id == message_id
+                and buffer.celery_task_id == celery_task_id):
+            # Base de la tarea + campos variables: una sola construcción del dict
+            buffer.event({
+                **buffer.log_base,
+                "timestamp": _now_iso(),
+                "event": event,
+                "level": level,
+                "message": message,
+                "details": details
+            })
+        else:
+            log_entry = {
+                "timestamp": _now_iso(),
+                "message_id": message_id,
+                "event": event,
+                "level": level,
+                "message": message,
+                "details": details,
+                "celery_task_id": celery_task_id
+            }
+            redis_helper = await get_redis_helper()
+            log_key = f"{REDIS_LOG_PREFIX}{message_id}"
+            await redis_helper.push_log(log_key, log_entry, max_entries=REDIS_LOG_MAX_ENTRIES)
 
         log_level = getattr(logging, level.upper(), logging.INFO)
         logging.log(log_level, f"[{message_id}] {event}: {message}", extra={
             "message_id": message_id,
             "event": event,
             "celery_task_id": celery_task_id,
-            **log_entry["details"]
+            **details
         })
 
     except Exception as e:
         logging.error(f"Task logging failed for {message_id}: {e}")
 
 
-async def _log_task_start(message_id: str, task_payload: Dict[str, Any], celery_task_id: str):
+async def _log_task_start(
+    message_id: str,
+    task_payload: Dict[str, Any],
+    celery_task_id: str,
+    nt_title: Optional[str] = None
+):
     """Log de inicio de tarea"""
     notification_type = task_payload.get("notification_type", "email")
+    nt_title = nt_title or notification_type.title()
     await _log_task_event(
         message_id=message_id,
         event="task_started",
-        message=f"{notification_type.title()} delivery task started",
+        message=f"{nt_title} delivery task started",
         level="INFO",
         details={
             "recipients_count": len(task_payload.get("to", [])),
@@ -1336,38 +2182,63 @@ async def _update_task_status(
 ):
     """Actualiza estado de tarea en Redis"""
     try:
-        from utils.redis_client import get_redis_client
-        from constants import REDIS_TASK_PREFIX
-
-        redis_client = await get_redis_client()
-
-        task_key = f"{REDIS_TASK_PREFIX}{message_id}"
-        existing_data = await redis_client.get(task_key)
-
-        if existing_data:
-            task_data = json.loads(existing_data)
-        else:
-            task_data = {
-                "message_id": message_id,
-                "celery_task_id": celery_task_id,
-                "created_at": datetime.utcnow().isoformat()
+        # Con buffer activo el GET/SETEX se hace una sola vez al final de la tarea
+        buffer = _LOG_BUFFER.get()
+        if buffer is not None and buffer.message_id == message_id:
+            updates = {
+                "status": status,
+                "updated_at": _now_iso(),
+                **(additional_info or {})
             }
+            buffer.status(updates)
 
-        task_data.update({
+            # Evento de depuración: solo con nivel DEBUG activo (evita un LPUSH por estado)
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                await _log_task_event(
+                    message_id=message_id,
+                    event="status_updated",
+                    message=f"Task status updated to {status}",
+                    level="DEBUG",
+                    details={"new_status": status},
+                    celery_task_id=celery_task_id
+                )
+            
+            # Retry/fallo: escribir ya, antes de que self.retry() publique el
+            # reintento o la excepción salga del worker
+            if status in ("retry", "failed"):
+                await buffer.flush()
+            return
+
+        now_iso = _now_iso()
+        updates = {
             "status": status,
-            "updated_at": datetime.utcnow().isoformat(),
+            "updated_at": now_iso,
             **(additional_info or {})
-        })
-
-        await redis_client.setex(task_key, 86400, json.dumps(task_data))
+        }
 
-        await _log_task_event(
-            message_id=message_id,
-            event="status_updated",
-            message=f"Task status updated to {status}",
-            level="DEBUG",
-            details={"new_status": status, **task_data},
-            celery_task_id=celery_task_id
+        # Evento de depuración (solo con nivel DEBUG activo) en el mismo round-trip que el estado
+        log_entries = None
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            log_entries = [dumps_log({
+                "timestamp": now_iso,
+                "message_id": message_id,
+                "event": "status_updated",
+                "level": "DEBUG",
+                "message": f"Task status updated to {status}",
+                "details": {"new_status": status},
+                "celery_task_id": celery_task_id
+            })]
+            logging.debug(f"[{message_id}] status_updated: Task status updated to {status}")
+
+        await log_event_and_status(
+            message_id,
+            status_updates=updates,
+            log_entries=log_entries,
+            defaults={
+                "message_id": message_id,
+                "celery_task_id": celery_task_id,
+                "created_at": now_iso
+            }
         )
 
     except Exception as e:
@@ -10,7 +10,8 @@ from typing import Optional, List, Dict, Any, Tuple
 from uuid import uuid4
 
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, or_, func
+from sqlalchemy import desc, and_, or_, func, insert, case
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.exc import SQLAlchemyError
 
 from models.database_models import (
@@ -23,6 +24,14 @@ from utils.database import get_db_session
 logger = logging.getLogger(__name__)
 
 
+# Columna de contador de provider_stats por tipo de estadística
+_STAT_COUNTERS = {
+    "sent": "total_sent",
+    "failed": "total_failed",
+    "rejected": "total_rejected",
+}
+
+
 class DatabaseService:
     """Servicio para operaciones de base de datos"""
 
@@ -97,28 +106,26 @@ class DatabaseService:
     ) -> bool:
         """Actualiza el estado de una notificación"""
         
+        # Campos básicos + timestamp
+        values = {"status": status, "updated_at": datetime.utcnow()}
+        if sent_at:
+            values["sent_at"] = sent_at
+        if retry_count is not None:
+            values["retry_count"] = retry_count
+        if celery_task_id:
+            values["celery_task_id"] = celery_task_id
+        
         try:
             with get_db_session() as db:
-                notification = db.query(Notification).filter(
+                # Un solo UPDATE por message_id (sin SELECT previo de la fila con sus bodies)
+                updated = db.query(Notification).filter(
                     Notification.message_id == message_id
-                ).first()
+                ).update(values, synchronize_session=False)
                 
-                if not notification:
+                if not updated:
                     logger.warning(f"Notification not found: {message_id}")
                     return False
                 
-                # Actualizar campos básicos
-                notification.status = status
-                if sent_at:
-                    notification.sent_at = sent_at
-                if retry_count is not None:
-                    notification.retry_count = retry_count
-                if celery_task_id:
-                    notification.celery_task_id = celery_task_id
-                
-                # Actualizar timestamp
-                notification.updated_at = datetime.utcnow()
-                
                 db.commit()
                 logger.debug(f"Updated notification {message_id} to {status}")
                 
@@ -218,6 +225,48 @@ class DatabaseService:
             logger.error(f"Error adding log for {message_id}: {e}")
             return None
 
+    @staticmethod
+    def add_notification_logs_bulk(rows: List[Dict[str, Any]]) -> int:
+        """
+        Inserta varios logs de evento en un solo INSERT multi-fila y un commit
+        
+        Args:
+            rows: Lista de dicts con los mismos campos que add_notification_log
+        
+        Returns:
+            Cantidad de filas insertadas (0 si falla)
+        """
+        
+        if not rows:
+            return 0
+        
+        # executemany requiere el mismo set de columnas en todas las filas
+        values = [
+            {
+                "message_id": row["message_id"],
+                "event_type": row["event_type"],
+                "event_status": row.get("event_status"),
+                "event_message": row.get("event_message"),
+                "details_json": row.get("details_json"),
+                "component": row.get("component"),
+                "provider": row.get("provider"),
+                "processing_time_ms": row.get("processing_time_ms")
+            }
+            for row in rows
+        ]
+        
+        try:
+            with get_db_session() as db:
+                db.execute(insert(NotificationLog), values)
+                db.commit()
+                
+                logger.debug(f"Added {len(values)} logs in bulk")
+                return len(values)
+                
+        except SQLAlchemyError as e:
+            logger.error(f"Error adding {len(values)} logs in bulk: {e}")
+            return 0
+
     @staticmethod
     def get_notification_logs(
         message_id: str,
@@ -472,64 +521,60 @@ class DatabaseService:
             stat_date: Fecha específica (default: hoy)
             stat_hour: Hora específica (default: hora actual)
         """
-        from datetime import date
+        counter = _STAT_COUNTERS.get(stat_type)
+        if counter is None:
+            logger.warning(f"Unknown stat_type: {stat_type}")
+            return False
         
         if not stat_date:
             stat_date = date.today()
         if stat_hour is None:
             stat_hour = datetime.now().hour
-            
+        
+        row = {
+            "provider": provider,
+            "stat_date": stat_date,
+            "stat_hour": stat_hour,
+            "total_sent": 0,
+            "total_failed": 0,
+            "total_rejected": 0,
+            "avg_processing_time_ms": processing_time_ms,
+            "max_processing_time_ms": processing_time_ms
+        }
+        row[counter] = 1
+        
+        # MySQL aplica las asignaciones en orden: promedio y máximo se calculan
+        # con los contadores previos, antes del incremento
+        on_duplicate = []
+        if processing_time_ms is not None:
+            previous_total = (
+                ProviderStats.total_sent + ProviderStats.total_failed + ProviderStats.total_rejected
+            )
+            on_duplicate.append((
+                "avg_processing_time_ms",
+                case(
+                    (ProviderStats.avg_processing_time_ms.is_(None), processing_time_ms),
+                    (ProviderStats.avg_processing_time_ms == 0, processing_time_ms),
+                    else_=(
+                        ProviderStats.avg_processing_time_ms * previous_total + processing_time_ms
+                    ).op("DIV")(previous_total + 1)
+                )
+            ))
+            on_duplicate.append((
+                "max_processing_time_ms",
+                func.greatest(
+                    func.coalesce(ProviderStats.max_processing_time_ms, processing_time_ms),
+                    processing_time_ms
+                )
+            ))
+        counter_column = getattr(ProviderStats, counter)
+        on_duplicate.append((counter, counter_column + 1))
+        
         try:
             with get_db_session() as db:
-                # Buscar registro existente
-                stats = db.query(ProviderStats).filter(
-                    and_(
-                        ProviderStats.provider == provider,
-                        ProviderStats.stat_date == stat_date,
-                        ProviderStats.stat_hour == stat_hour
-                    )
-                ).first()
-                
-                # Crear si no existe
-                if not stats:
-                    stats = ProviderStats(
-                        provider=provider,
-                        stat_date=stat_date,
-                        stat_hour=stat_hour,
-                        total_sent=0,
-                        total_failed=0,
-                        total_rejected=0,
-                        avg_processing_time_ms=None,
-                        max_processing_time_ms=None
-                    )
-                    db.add(stats)
-                
-                # Incrementar contadores según tipo
-                if stat_type == "sent":
-                    stats.total_sent += 1
-                elif stat_type == "failed":
-                    stats.total_failed += 1
-                elif stat_type == "rejected":
-                    stats.total_rejected += 1
-                else:
-                    logger.warning(f"Unknown stat_type: {stat_type}")
-                    return False
-                
-                # Actualizar métricas de tiempo si se proporciona
-                if processing_time_ms is not None:
-                    # Calcular nuevo promedio
-                    total_messages = stats.total_sent + stats.total_failed + stats.total_rejected
-                    if total_messages > 1 and stats.avg_processing_time_ms:
-                        # Promedio ponderado
-                        stats.avg_processing_time_ms = int(
-                            ((stats.avg_processing_time_ms * (total_messages - 1)) + processing_time_ms) / total_messages
-                        )
-                    else:
-                        stats.avg_processing_time_ms = processing_time_ms
-                    
-                    # Actualizar máximo
-                    if not stats.max_processing_time_ms or processing_time_ms > stats.max_processing_time_ms:
-                        stats.max_processing_time_ms = processing_time_ms
+                # Upsert en un solo statement (sin SELECT + INSERT/UPDATE)
+                stmt = mysql_insert(ProviderStats).values(**row)
+                db.execute(stmt.on_duplicate_key_update(on_duplicate))
                 
                 db.commit()
                 logger.debug(f"Updated {provider} stats: {stat_type} +1 (date={stat_date}, hour={stat_hour})")
@@ -555,8 +600,6 @@ class DatabaseService:
             date_to: Fecha fin
             group_by_hour: Si agrupar por hora o solo por día
         """
-        from datetime import date
-        
         try:
             with get_db_session() as db:
                 if group_by_hour:
@@ -638,8 +681,6 @@ class DatabaseService:
         """
         Obtiene resumen de estadísticas de proveedores para los últimos N días
         """
-        from datetime import date, timedelta
-        
         date_from = date.today() - timedelta(days=days_back)
         
         try:
@@ -686,8 +727,6 @@ class DatabaseService:
         """
         Crea entrada inicial de estadísticas para un proveedor/fecha/hora si no existe
         """
-        from datetime import date
-        
         if not stat_date:
             stat_date = date.today()
         if stat_hour is None:
@@ -17,7 +17,7 @@ from utils.database import get_db_session
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class TimeRange:
     """Clase para manejar rangos de tiempo"""
     start: datetime
@@ -37,7 +37,7 @@ class TimeRange:
         return cls(start=start, end=end)
 
 
-@dataclass
+@dataclass(slots=True)
 class MetricsFilter:
     """Clase para filtros de métricas"""
     time_range: TimeRange
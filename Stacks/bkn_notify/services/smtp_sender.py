@@ -3,9 +3,14 @@ SMTP sender service
 Maneja envío de emails via SMTP con soporte para attachments y HTML
 """
 
+import re
 import ssl
+import asyncio
+import time
+import hashlib
 import smtplib
 import logging
+import orjson
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
@@ -17,12 +22,43 @@ import base64
 
 from constants import SMTP_TIMEOUT
 
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
 
 class SMTPSender:
     """
     Cliente SMTP para envío de emails
     """
     
+    # Instancias compartidas por proceso (ver get)
+    _INSTANCES: Dict[str, "SMTPSender"] = {}
+    
+    @classmethod
+    def get(cls, provider_config: Dict[str, Any]) -> "SMTPSender":
+        """
+        Obtiene el SMTPSender compartido para una configuración de proveedor
+        Reutiliza la conexión SMTP (TLS + AUTH) entre tareas del proceso
+        """
+        key = hashlib.blake2b(
+            orjson.dumps(provider_config, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str),
+            digest_size=8
+        ).hexdigest()
+        
+        sender = cls._INSTANCES.get(key)
+        if sender is None:
+            sender = cls._INSTANCES[key] = cls(provider_config)
+        return sender
+    
+    @classmethod
+    def close_all(cls):
+        """
+        Cierra las conexiones SMTP de todas las instancias compartidas
+        Útil para cleanup en shutdown
+        """
+        for sender in list(cls._INSTANCES.values()):
+            sender.close()
+        cls._INSTANCES.clear()
+    
     def __init__(self, provider_config: Dict[str, Any]):
         """
         Inicializa SMTP sender con configuración del proveedor
@@ -43,6 +79,14 @@ class SMTPSender:
         self.from_name = provider_config.get('from_name', '')
         self.reply_to = provider_config.get('reply_to', '')
         self.return_path = provider_config.get('return_path', '')
+        
+        # Conexión persistente (se abre en el primer envío)
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        # Segundos de inactividad tras los que se verifica la conexión con NOOP
+        self.idle_check = provider_config.get('idle_check', 30)
+        # La conexión no admite envíos simultáneos (tareas concurrentes del mismo loop)
+        self._lock = asyncio.Lock()
     
     async def send_email(
         self,
@@ -63,7 +107,7 @@ class SMTPSender:
             Dict con resultado del envío: success, message_id, provider_response, etc.
         """
         
-        start_time = datetime.now()
+        start_clock = time.monotonic()
         
         try:
             # Validar parámetros
@@ -90,7 +134,7 @@ class SMTPSender:
             
             # Calcular tiempo de envío
             end_time = datetime.now()
-            send_duration = (end_time - start_time).total_seconds()
+            send_duration = time.monotonic() - start_clock
             
             # Construir respuesta exitosa
             result = {
@@ -109,7 +153,7 @@ class SMTPSender:
             
         except Exception as e:
             end_time = datetime.now()
-            send_duration = (end_time - start_time).total_seconds()
+            send_duration = time.monotonic() - start_clock
             
             logging.error(f"SMTP send failed: {e}")
             
@@ -143,10 +187,8 @@ class SMTPSender:
             raise ValueError("Either body_text or body_html is required")
         
         # Validar formato de emails
-        import re
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
         for email in to:
-            if not re.match(email_pattern, email):
+            if not _EMAIL_RE.match(email):
                 raise ValueError(f"Invalid email format: {email}")
     
     async def _build_mime_message(
@@ -304,32 +346,65 @@ class SMTPSender:
                 except:
                     pass
     
+    def _connect(self) -> smtplib.SMTP:
+        """
+        Abre conexión SMTP autenticada
+        """
+        if self.use_ssl:
+            # SSL directo (puerto 465)
+            context = ssl.create_default_context()
+            smtp_client = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=context)
+        else:
+            # SMTP estándar
+            smtp_client = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            
+            # STARTTLS si está habilitado
+            if self.use_tls:
+                smtp_client.starttls()
+        
+        # Autenticación solo si hay username/password
+        if self.username and self.password:
+            smtp_client.login(self.username, self.password)
+        
+        return smtp_client
+    
+    def close(self):
+        """
+        Cierra la conexión SMTP persistente
+        """
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+    
     async def _send_via_smtp(self, message: MIMEMultipart, recipients: List[str]) -> Dict[str, Any]:
         """
         Envía mensaje via protocolo SMTP
+        El diálogo SMTP (bloqueante) corre en un thread para no detener el event loop
+        """
+        async with self._lock:
+            return await asyncio.to_thread(self._send_via_smtp_sync, message, recipients)
+    
+    def _send_via_smtp_sync(self, message: MIMEMultipart, recipients: List[str]) -> Dict[str, Any]:
+        """
+        Envío SMTP sobre la conexión persistente
+        Reutiliza la conexión abierta; si el servidor la cerró, reconecta una vez
         """
-        smtp_client = None
-        
         try:
-            # Crear conexión SMTP
-            if self.use_ssl:
-                # SSL directo (puerto 465)
-                context = ssl.create_default_context()
-                smtp_client = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=context)
-            else:
-                # SMTP estándar
-                smtp_client = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
-                
-                # STARTTLS si está habilitado
-                if self.use_tls:
-                    smtp_client.starttls()
+            try:
+                self._check_idle_connection()
+                if self._smtp is None:
+                    self._smtp = self._connect()
+                smtp_response = self._smtp.send_message(message, to_addrs=recipients)
+            except (smtplib.SMTPServerDisconnected, ConnectionError, ssl.SSLError):
+                # Socket viejo (timeout de inactividad del servidor)
+                self.close()
+                self._smtp = self._connect()
+                smtp_response = self._smtp.send_message(message, to_addrs=recipients)
             
-            # Autenticación solo si hay username/password
-            if self.username and self.password:
-                smtp_client.login(self.username, self.password)
-            
-            # Enviar mensaje
-            smtp_response = smtp_client.send_message(message, to_addrs=recipients)
+            self._last_used = time.monotonic()
             
             return {
                 "smtp_server": f"{self.host}:{self.port}",
@@ -339,22 +414,45 @@ class SMTPSender:
             }
             
         except smtplib.SMTPAuthenticationError as e:
+            self.close()
             raise Exception(f"SMTP authentication failed: {e}")
         except smtplib.SMTPRecipientsRefused as e:
+            self._reset()
             raise Exception(f"Recipients refused: {e}")
         except smtplib.SMTPDataError as e:
+            self._reset()
             raise Exception(f"SMTP data error: {e}")
         except smtplib.SMTPException as e:
+            self.close()
             raise Exception(f"SMTP error: {e}")
         except Exception as e:
+            self.close()
             raise Exception(f"SMTP connection error: {e}")
-        finally:
-            # Cerrar conexión
-            if smtp_client:
-                try:
-                    smtp_client.quit()
-                except:
-                    pass
+    
+    def _check_idle_connection(self):
+        """
+        NOOP sobre una conexión inactiva: si el servidor ya la cerró se descarta
+        antes de intentar el envío
+        """
+        if self._smtp is None or time.monotonic() - self._last_used < self.idle_check:
+            return
+        try:
+            code, _ = self._smtp.noop()
+            if code != 250:
+                self.close()
+        except Exception:
+            self.close()
+    
+    def _reset(self):
+        """
+        RSET tras un rechazo para dejar la conexión lista para el siguiente envío
+        """
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.rset()
+        except Exception:
+            self.close()
 
     def get_sender_info(self) -> Dict[str, Any]:
         """
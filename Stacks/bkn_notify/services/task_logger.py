@@ -3,13 +3,190 @@ Task logger service
 Maneja logging específico de tareas Celery con Redis storage
 """
 
-import json
 import logging
+import orjson
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
-from constants import REDIS_LOG_PREFIX, REDIS_TASK_PREFIX
-from utils.redis_client import get_redis_client, RedisHelper
+from constants import (
+    REDIS_LOG_PREFIX, REDIS_TASK_PREFIX, REDIS_LOG_TTL, REDIS_LOG_MAX_ENTRIES, REDIS_LOG_STREAM
+)
+from redis.exceptions import ResponseError
+
+from utils.redis_client import get_redis_client, get_redis_helper
+
+
+# Opciones de serialización: datetimes naive como UTC con sufijo Z
+_ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps_log(data: Any) -> bytes:
+    """
+    Serializa estado/logs de tareas para Redis (bytes, redis-py los acepta directo)
+    """
+    return orjson.dumps(data, default=str, option=_ORJSON_OPTIONS)
+
+
+def encode_task_fields(data: Dict[str, Any]) -> Dict[str, bytes]:
+    """
+    Campos del hash de estado de tarea: cada valor se guarda como JSON
+    (decodificación uniforme con decode_task_state, también para dicts anidados)
+    """
+    return {key: dumps_log(value) for key, value in data.items()}
+
+
+def decode_task_state(raw: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Decodifica el hash de estado de tarea (HGETALL) a dict
+    """
+    return {key: orjson.loads(value) for key, value in raw.items()}
+
+
+async def load_task_state(
+    redis_client,
+    message_id: str,
+    fields: Optional[List[str]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Lee el estado de una tarea desde Redis
+    Soporta claves en formato anterior (string JSON) hasta que expiren
+    
+    Args:
+        fields: Campos a leer (HMGET); None lee el hash completo (HGETALL)
+    
+    Returns:
+        Dict con el estado o None si la tarea no existe
+    """
+    task_key = f"{REDIS_TASK_PREFIX}{message_id}"
+    
+    try:
+        if fields:
+            values = await redis_client.hmget(task_key, fields)
+            raw = {key: value for key, value in zip(fields, values) if value is not None}
+        else:
+            raw = await redis_client.hgetall(task_key)
+    except ResponseError:
+        # WRONGTYPE: estado guardado como JSON plano
+        legacy = await redis_client.get(task_key)
+        return orjson.loads(legacy) if legacy else None
+    
+    return decode_task_state(raw) if raw else None
+
+
+async def read_task_logs(redis_client, message_id: str, offset: int = 0, limit: int = 50):
+    """
+    Lee logs de una tarea, del más reciente al más antiguo
+    Soporta claves en stream (XREVRANGE) y en lista (LRANGE)
+    
+    Returns:
+        Tupla (total de entradas, entradas serializadas de la página)
+    """
+    log_key = f"{REDIS_LOG_PREFIX}{message_id}"
+    
+    try:
+        total = await redis_client.xlen(log_key)
+        if total == 0 or offset >= total:
+            return total, []
+        # Streams no paginan por posición: se leen las primeras offset+limit (máx ~500)
+        entries = await redis_client.xrevrange(log_key, count=offset + limit)
+        return total, [fields["data"] for _, fields in entries[offset:] if "data" in fields]
+    except ResponseError:
+        # WRONGTYPE: logs guardados como lista
+        total = await redis_client.llen(log_key)
+        if total == 0:
+            return 0, []
+        return total, await redis_client.lrange(log_key, offset, offset + limit - 1)
+
+
+# Estado + logs de una tarea en un solo round-trip atómico
+# KEYS[1]: hash de estado, KEYS[2]: stream (o lista) de logs
+# ARGV[1]: pares campo/valor a actualizar, ARGV[2]: pares solo si el campo no existe
+# ARGV[3]: TTL del estado, ARGV[4]: TTL de los logs
+# ARGV[5]: máximo de entradas de log, ARGV[6]: '1' para escribir logs en stream
+# ARGV[7..]: campos a actualizar, luego defaults, luego entradas de log serializadas
+EVENT_AND_STATUS_LUA = """
+local n_updates = tonumber(ARGV[1])
+local n_defaults = tonumber(ARGV[2])
+local i = 7
+if n_updates > 0 then
+    if redis.call('TYPE', KEYS[1]).ok == 'string' then
+        redis.call('DEL', KEYS[1])
+    end
+    for _ = 1, n_defaults do
+        redis.call('HSETNX', KEYS[1], ARGV[i], ARGV[i + 1])
+        i = i + 2
+    end
+    local fields = {}
+    for _ = 1, n_updates do
+        table.insert(fields, ARGV[i])
+        table.insert(fields, ARGV[i + 1])
+        i = i + 2
+    end
+    redis.call('HSET', KEYS[1], unpack(fields))
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+if i <= #ARGV then
+    -- Claves creadas como lista antes del cambio se siguen escribiendo como lista
+    if ARGV[6] == '1' and redis.call('TYPE', KEYS[2]).ok ~= 'list' then
+        for j = i, #ARGV do
+            redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[5], '*', 'data', ARGV[j])
+        end
+    else
+        redis.call('LPUSH', KEYS[2], unpack(ARGV, i))
+        redis.call('LTRIM', KEYS[2], 0, tonumber(ARGV[5]) - 1)
+    end
+    redis.call('EXPIRE', KEYS[2], ARGV[4])
+end
+return 1
+"""
+
+# Script registrado en el primer uso (el SHA se reutiliza con EVALSHA)
+_event_and_status_script = None
+
+
+async def log_event_and_status(
+    message_id: str,
+    status_updates: Optional[Dict[str, Any]] = None,
+    log_entries: Optional[List[str]] = None,
+    ttl: int = 86400,
+    defaults: Optional[Dict[str, Any]] = None,
+    client: Optional[Any] = None
+):
+    """
+    Actualiza campos de estado y agrega logs de una tarea en una sola llamada Redis
+    
+    Args:
+        message_id: ID único del mensaje/notificación
+        status_updates: Campos a actualizar en el hash de estado de la tarea
+        log_entries: Entradas de log ya serializadas en JSON (orden cronológico)
+        ttl: TTL del estado en segundos
+        defaults: Campos iniciales que solo se escriben si aún no existen
+        client: Pipeline Redis opcional (la llamada se encola hasta su execute)
+    """
+    global _event_and_status_script
+    
+    redis_client = await get_redis_client()
+    
+    if _event_and_status_script is None:
+        _event_and_status_script = redis_client.register_script(EVENT_AND_STATUS_LUA)
+    
+    updates = encode_task_fields(status_updates or {})
+    initial = encode_task_fields(defaults or {"message_id": message_id}) if updates else {}
+    
+    args = [
+        len(updates), len(initial), ttl, REDIS_LOG_TTL,
+        REDIS_LOG_MAX_ENTRIES, 1 if REDIS_LOG_STREAM else 0
+    ]
+    for fields in (initial, updates):
+        for key, value in fields.items():
+            args.extend((key, value))
+    args.extend(log_entries or [])
+    
+    await _event_and_status_script(
+        keys=[f"{REDIS_TASK_PREFIX}{message_id}", f"{REDIS_LOG_PREFIX}{message_id}"],
+        args=args,
+        client=client or redis_client
+    )
 
 
 async def log_task_event(
@@ -31,10 +208,12 @@ async def log_task_event(
         details: Información adicional del evento
         celery_task_id: ID de la tarea Celery (opcional)
     """
+    # Eventos DEBUG: solo se persisten con nivel DEBUG activo (un round-trip menos)
+    if level == "DEBUG" and not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
     
     try:
-        redis_client = await get_redis_client()
-        redis_helper = RedisHelper(redis_client)
+        redis_helper = await get_redis_helper()
         
         # Preparar entrada de log
         log_entry = {
@@ -53,7 +232,7 @@ async def log_task_event(
         
         # Guardar en Redis con clave específica del mensaje
         log_key = f"{REDIS_LOG_PREFIX}{message_id}"
-        success = await redis_helper.push_log(log_key, log_entry, max_entries=500)
+        success = await redis_helper.push_log(log_key, log_entry, max_entries=REDIS_LOG_MAX_ENTRIES)
         
         if success:
             # También log en sistema de logging estándar
@@ -272,39 +451,38 @@ async def update_task_status(
     Actualiza estado de tarea en Redis
     """
     try:
-        redis_client = await get_redis_client()
+        # Actualizar estado y timestamp (HSET de campos, sin leer el estado previo)
+        now_iso = datetime.utcnow().isoformat()
+        updates = {
+            "status": status,
+            "updated_at": now_iso,
+            **(additional_info or {})
+        }
         
-        # Obtener información existente de la tarea
-        task_key = f"{REDIS_TASK_PREFIX}{message_id}"
-        existing_data = await redis_client.get(task_key)
+        # Log del cambio de estado: solo con nivel DEBUG activo, en el mismo round-trip
+        log_entries = None
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            log_entries = [dumps_log({
+                "timestamp": now_iso,
+                "message_id": message_id,
+                "event": "status_updated",
+                "level": "DEBUG",
+                "message": f"Task status updated to {status}",
+                "details": {"new_status": status, "celery_task_id": celery_task_id},
+                "celery_task_id": celery_task_id
+            })]
+            logging.debug(f"[{message_id}] status_updated: Task status updated to {status}")
         
-        if existing_data:
-            task_data = json.loads(existing_data)
-        else:
-            task_data = {
+        # TTL de 24 horas
+        await log_event_and_status(
+            message_id,
+            status_updates=updates,
+            log_entries=log_entries,
+            defaults={
                 "message_id": message_id,
                 "celery_task_id": celery_task_id,
-                "created_at": datetime.utcnow().isoformat()
+                "created_at": now_iso
             }
-        
-        # Actualizar estado y timestamp
-        task_data.update({
-            "status": status,
-            "updated_at": datetime.utcnow().isoformat(),
-            **(additional_info or {})
-        })
-        
-        # Guardar en Redis con TTL de 24 horas
-        await redis_client.setex(task_key, 86400, json.dumps(task_data))
-        
-        # Log del cambio de estado
-        await log_task_event(
-            message_id=message_id,
-            event="status_updated",
-            message=f"Task status updated to {status}",
-            level="DEBUG",
-            details={"new_status": status, **task_data},
-            celery_task_id=celery_task_id
         )
         
     except Exception as e:
@@ -317,17 +495,16 @@ async def get_task_logs(message_id: str, limit: int = 50, offset: int = 0) -> Li
     """
     try:
         redis_client = await get_redis_client()
-        log_key = f"{REDIS_LOG_PREFIX}{message_id}"
         
         # Obtener logs con paginación
-        log_entries_raw = await redis_client.lrange(log_key, offset, offset + limit - 1)
+        _, log_entries_raw = await read_task_logs(redis_client, message_id, offset, limit)
         
         logs = []
         for raw_entry in log_entries_raw:
             try:
-                log_entry = json.loads(raw_entry)
+                log_entry = orjson.loads(raw_entry)
                 logs.append(log_entry)
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 continue
         
         return logs
@@ -355,16 +532,17 @@ async def cleanup_old_task_logs(days_to_keep: int = 7) -> Dict[str, int]:
         for log_key in log_keys:
             try:
                 # Obtener el log más reciente para verificar fecha
-                latest_log = await redis_client.lindex(log_key, 0)
-                if latest_log:
-                    log_data = json.loads(latest_log)
+                message_id = log_key[len(REDIS_LOG_PREFIX):]
+                _, latest = await read_task_logs(redis_client, message_id, 0, 1)
+                if latest:
+                    log_data = orjson.loads(latest[0])
                     log_timestamp = datetime.fromisoformat(log_data["timestamp"]).timestamp()
                     
                     if log_timestamp < cutoff_timestamp:
                         await redis_client.delete(log_key)
                         cleaned_count += 1
                         
-            except (json.JSONDecodeError, KeyError, ValueError):
+            except (orjson.JSONDecodeError, KeyError, ValueError):
                 # Si no se puede parsear, eliminar por seguridad
                 await redis_client.delete(log_key)
                 cleaned_count += 1
@@ -391,7 +569,8 @@ def get_logging_stats() -> Dict[str, Any]:
         return {
             "log_prefix": REDIS_LOG_PREFIX,
             "task_prefix": REDIS_TASK_PREFIX,
-            "max_entries_per_task": 500,
+            "max_entries_per_task": REDIS_LOG_MAX_ENTRIES,
+            "log_storage": "stream" if REDIS_LOG_STREAM else "list",
             "log_retention_days": 7,
             "features": [
                 "task_lifecycle_tracking",
@@ -3,12 +3,47 @@ Template rendering service
 Renderiza plantillas Jinja2 con variables y manejo de errores
 """
 
+import re
+import time
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, Optional, FrozenSet, Tuple
 from datetime import datetime
 
-from utils.template_loader import load_template_files, render_template as render_template_files
+import orjson
+from jinja2 import meta
+
+from utils.template_loader import (
+    load_template_files, get_jinja_environment, get_template_variable_names,
+    compile_template, render_template as render_template_files
+)
 from utils.config_loader import load_config
+from constants import TEMPLATE_RENDER_CONCURRENCY
+
+# Patrones de post-procesamiento compilados una vez por proceso
+_WHITESPACE_RE = re.compile(r'\s+')
+_HTML_COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+_DANGEROUS_HTML_TAGS = ('<script', '<iframe', '<object', '<embed', '<form')
+
+# Limita renders concurrentes; cada render (lectura + compilación Jinja) corre en un thread
+_RENDER_SEM = asyncio.Semaphore(TEMPLATE_RENDER_CONCURRENCY)
+
+# Cache de contenido renderizado por (template_id, hash de variables) con TTL
+RENDERED_CACHE_SIZE = 1024
+RENDERED_CACHE_TTL = 300
+_rendered_cache: "OrderedDict[Tuple[str, bytes], Tuple[float, Dict[str, str]]]" = OrderedDict()
+# Un render por clave a la vez: los envíos repetidos esperan el resultado en cache
+_render_locks: Dict[Tuple[str, bytes], asyncio.Lock] = {}
+
+# Variables de sistema que cambian entre renders (fecha/hora): un template que
+# las usa sin que el usuario las fije no se cachea
+_VOLATILE_SYSTEM_VARIABLES = frozenset({
+    "system", "now", "today", "timestamp", "timestamp_unix",
+    "date_short", "date_long", "time_short", "time_long", "datetime_readable"
+})
 
 
 async def render_template(
@@ -28,25 +63,37 @@ async def render_template(
         Dict con contenido renderizado: {"subject": "...", "body_text": "...", "body_html": "..."}
     """
     
+    cache_key = _rendered_cache_key(template_id, variables)
+    
     try:
-        # Preparar variables con valores por defecto del sistema
-        enriched_variables = await _enrich_template_variables(variables)
-        
-        # Renderizar template desde filesystem
-        rendered_content = render_template_files(template_id, enriched_variables)
+        if cache_key is None:
+            return (await _render_template_files(template_id, variables))[0]
         
-        # Post-procesar contenido renderizado
-        processed_content = await _post_process_rendered_content(rendered_content)
-        
-        logging.info(f"Template rendered successfully: {template_id}")
-        return processed_content
+        lock = _render_locks.setdefault(cache_key, asyncio.Lock())
+        try:
+            async with lock:
+                cached = _get_rendered_cache(cache_key)
+                if cached is not None:
+                    return cached
+                
+                processed_content, template_variables = await _render_template_files(
+                    template_id, variables
+                )
+                if not (template_variables & (_VOLATILE_SYSTEM_VARIABLES - variables.keys())):
+                    _set_rendered_cache(cache_key, processed_content)
+                return dict(processed_content)
+        finally:
+            if not lock.locked():
+                _render_locks.pop(cache_key, None)
         
     except FileNotFoundError:
         logging.warning(f"Template not found: {template_id}")
         
         if fallback_content:
             # Usar contenido de fallback y renderizar variables
-            return await _render_fallback_content(fallback_content, enriched_variables)
+            return await _render_fallback_content(
+                fallback_content, await _enrich_template_variables(variables)
+            )
         else:
             raise ValueError(f"Template '{template_id}' not found and no fallback provided")
             
@@ -55,11 +102,89 @@ async def render_template(
         
         if fallback_content:
             logging.info(f"Using fallback content for {template_id}")
-            return await _render_fallback_content(fallback_content, enriched_variables)
+            return await _render_fallback_content(
+                fallback_content, await _enrich_template_variables(variables)
+            )
         else:
             raise
 
 
+async def _render_template_files(
+    template_id: str,
+    variables: Dict[str, Any]
+) -> Tuple[Dict[str, str], FrozenSet[str]]:
+    """
+    Enriquece variables, renderiza los archivos del template en un thread y post-procesa
+    Retorna (contenido, variables que usa el template)
+    """
+    
+    # Preparar variables con valores por defecto del sistema
+    enriched_variables = await _enrich_template_variables(variables)
+    
+    # Renderizar template desde filesystem (fuera del event loop)
+    async with _RENDER_SEM:
+        rendered_content, template_variables = await asyncio.to_thread(
+            _render_files_sync, template_id, enriched_variables
+        )
+    
+    # Post-procesar contenido renderizado
+    processed_content = await _post_process_rendered_content(rendered_content)
+    
+    logging.info(f"Template rendered successfully: {template_id}")
+    return processed_content, template_variables
+
+
+def _render_files_sync(template_id: str, variables: Dict[str, Any]) -> Tuple[Dict[str, str], FrozenSet[str]]:
+    """
+    Render de los archivos del template (corre en thread)
+    """
+    return render_template_files(template_id, variables), get_template_variable_names(template_id)
+
+
+def _rendered_cache_key(template_id: str, variables: Dict[str, Any]) -> Optional[Tuple[str, bytes]]:
+    """
+    Clave de cache (template_id, blake2b de las variables); None si no son serializables
+    """
+    try:
+        serialized = orjson.dumps(variables, option=orjson.OPT_SORT_KEYS)
+    except TypeError:
+        return None
+    return template_id, hashlib.blake2b(serialized, digest_size=16).digest()
+
+
+def _get_rendered_cache(cache_key: Tuple[str, bytes]) -> Optional[Dict[str, str]]:
+    """
+    Contenido renderizado en cache (copia), si no expiró
+    """
+    cached = _rendered_cache.get(cache_key)
+    if cached is None:
+        return None
+    
+    if cached[0] < time.monotonic():
+        _rendered_cache.pop(cache_key, None)
+        return None
+    
+    _rendered_cache.move_to_end(cache_key)
+    return dict(cached[1])
+
+
+def _set_rendered_cache(cache_key: Tuple[str, bytes], content: Dict[str, str]):
+    """
+    Guarda contenido renderizado en el LRU con expiración
+    """
+    _rendered_cache[cache_key] = (time.monotonic() + RENDERED_CACHE_TTL, dict(content))
+    _rendered_cache.move_to_end(cache_key)
+    if len(_rendered_cache) > RENDERED_CACHE_SIZE:
+        _rendered_cache.popitem(last=False)
+
+
+def clear_rendered_cache():
+    """
+    Limpia el cache de contenido renderizado
+    """
+    _rendered_cache.clear()
+
+
 async def render_inline_content(
     subject: Optional[str] = None,
     body_text: Optional[str] = None, 
@@ -195,8 +320,6 @@ async def _render_string_template(template_string: str, variables: Dict[str, Any
     """
     
     try:
-        from utils.template_loader import compile_template
-        
         # Compilar y renderizar template string
         compiled_template = compile_template(template_string, f"inline_{field_name}")
         rendered = compiled_template.render(**variables)
@@ -249,8 +372,7 @@ async def _post_process_rendered_content(content: Dict[str, str]) -> Dict[str, s
             if field == "subject":
                 cleaned = cleaned.replace('\n', ' ').replace('\t', ' ')
                 # Remover espacios múltiples
-                import re
-                cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+                cleaned = _WHITESPACE_RE.sub(' ', cleaned).strip()
                 
                 # Validar longitud del subject
                 if len(cleaned) > 998:  # RFC 2822 limit
@@ -276,16 +398,13 @@ async def _validate_html_content(html_content: str) -> str:
     """
     
     try:
-        # Verificar que no hay scripts maliciosos (básico)
-        import re
-        
         # Remover comentarios HTML problemáticos
-        html_content = re.sub(r'<!--.*?-->', '', html_content, flags=re.DOTALL)
+        html_content = _HTML_COMMENT_RE.sub('', html_content)
         
         # Verificar tags problemáticos (básico - no reemplaza un sanitizer real)
-        dangerous_tags = ['<script', '<iframe', '<object', '<embed', '<form']
-        for tag in dangerous_tags:
-            if tag in html_content.lower():
+        html_lower = html_content.lower()
+        for tag in _DANGEROUS_HTML_TAGS:
+            if tag in html_lower:
                 logging.warning(f"Potentially dangerous HTML tag found: {tag}")
         
         return html_content
@@ -295,6 +414,15 @@ async def _validate_html_content(html_content: str) -> str:
         return html_content
 
 
+@lru_cache(maxsize=256)
+def _find_template_variables(content: str) -> FrozenSet[str]:
+    """
+    Variables no declaradas de un template (AST memoizado por contenido)
+    """
+    ast = get_jinja_environment().parse(content)
+    return frozenset(meta.find_undeclared_variables(ast))
+
+
 def validate_template_variables(template_id: str, variables: Dict[str, Any]) -> Dict[str, Any]:
     """
     Valida variables contra template sin renderizar
@@ -313,15 +441,9 @@ def validate_template_variables(template_id: str, variables: Dict[str, Any]) ->
         }
         
         # Intentar compilar templates para detectar variables faltantes
-        from jinja2 import meta
-        from utils.template_loader import get_jinja_environment
-        
-        env = get_jinja_environment()
-        
         for file_type, content in template_files.items():
             try:
-                ast = env.parse(content)
-                required_vars = meta.find_undeclared_variables(ast)
+                required_vars = _find_template_variables(content)
                 
                 missing_vars = required_vars - set(variables.keys())
                 if missing_vars:
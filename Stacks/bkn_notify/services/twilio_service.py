@@ -4,7 +4,11 @@ Manejo de envíos via Twilio para canales SMS y WhatsApp
 """
 
 import os
+import time
+import hashlib
+import asyncio
 import logging
+import orjson
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
@@ -24,6 +28,25 @@ class TwilioService:
     Cliente para envío de SMS y WhatsApp via Twilio API
     """
     
+    # Instancias compartidas por configuración de proveedor (una por proceso worker)
+    _INSTANCES: Dict[str, "TwilioService"] = {}
+    
+    @classmethod
+    def get(cls, provider_config: Dict[str, Any]) -> "TwilioService":
+        """
+        Obtiene el TwilioService compartido para una configuración de proveedor
+        Reutiliza el cliente Twilio (sesión HTTP con keep-alive) entre tareas del proceso
+        """
+        key = hashlib.blake2b(
+            orjson.dumps(provider_config or {}, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str),
+            digest_size=8
+        ).hexdigest()
+        
+        service = cls._INSTANCES.get(key)
+        if service is None:
+            service = cls._INSTANCES[key] = cls(provider_config)
+        return service
+    
     def __init__(self, provider_config: Dict[str, Any] = None):
         """
         Inicializa servicio Twilio con configuración
@@ -77,7 +100,7 @@ class TwilioService:
         Returns:
             Dict con resultado del envío
         """
-        start_time = datetime.now()
+        start_clock = time.monotonic()
         
         try:
             # Validaciones
@@ -105,11 +128,11 @@ class TwilioService:
                 if custom_params.get('validity_period'):
                     send_params['validity_period'] = custom_params['validity_period']
             
-            # Enviar SMS
-            twilio_message = self.client.messages.create(**send_params)
+            # Enviar SMS (SDK bloqueante: en thread para no detener el event loop)
+            twilio_message = await asyncio.to_thread(self.client.messages.create, **send_params)
             
             # Calcular tiempo de procesamiento
-            processing_time = (datetime.now() - start_time).total_seconds() * 1000
+            processing_time = (time.monotonic() - start_clock) * 1000
             
             return {
                 'success': True,
@@ -130,7 +153,7 @@ class TwilioService:
             }
             
         except TwilioRestException as e:
-            processing_time = (datetime.now() - start_time).total_seconds() * 1000
+            processing_time = (time.monotonic() - start_clock) * 1000
             
             return {
                 'success': False,
@@ -147,7 +170,7 @@ class TwilioService:
             }
             
         except Exception as e:
-            processing_time = (datetime.now() - start_time).total_seconds() * 1000
+            processing_time = (time.monotonic() - start_clock) * 1000
             
             return {
                 'success': False,
@@ -182,7 +205,7 @@ class TwilioService:
         Returns:
             Dict con resultado del envío
         """
-        start_time = datetime.now()
+        start_clock = time.monotonic()
         
         try:
             # Validaciones
@@ -206,9 +229,9 @@ class TwilioService:
                 # Usar template aprobado
                 send_params['content_sid'] = template_name
                 if template_params:
-                    send_params['content_variables'] = json.dumps({
+                    send_params['content_variables'] = orjson.dumps({
                         str(i+1): param for i, param in enumerate(template_params)
-                    })
+                    }).decode()
             elif message:
                 # Mensaje de texto libre
                 send_params['body'] = message
@@ -225,11 +248,11 @@ class TwilioService:
                 if custom_params.get('media_url'):
                     send_params['media_url'] = custom_params['media_url']
             
-            # Enviar WhatsApp
-            twilio_message = self.client.messages.create(**send_params)
+            # Enviar WhatsApp (SDK bloqueante: en thread para no detener el event loop)
+            twilio_message = await asyncio.to_thread(self.client.messages.create, **send_params)
             
             # Calcular tiempo de procesamiento
-            processing_time = (datetime.now() - start_time).total_seconds() * 1000
+            processing_time = (time.monotonic() - start_clock) * 1000
             
             return {
                 'success': True,
@@ -251,7 +274,7 @@ class TwilioService:
             }
             
         except TwilioRestException as e:
-            processing_time = (datetime.now() - start_time).total_seconds() * 1000
+            processing_time = (time.monotonic() - start_clock) * 1000
             
             return {
                 'success': False,
@@ -268,7 +291,7 @@ class TwilioService:
             }
             
         except Exception as e:
-            processing_time = (datetime.now() - start_time).total_seconds() * 1000
+            processing_time = (time.monotonic() - start_clock) * 1000
             
             return {
                 'success': False,
@@ -8,6 +8,7 @@ import os
 from contextlib import contextmanager
 from typing import Generator, Optional
 
+import orjson
 from sqlalchemy import create_engine, event, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
@@ -42,6 +43,11 @@ def get_database_url() -> str:
     return url
 
 
+def _json_serializer(value) -> str:
+    """Serializa columnas JSON con orjson (details_json, params_json, etc.)"""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
 def create_database_engine() -> Engine:
     """Crea engine de SQLAlchemy con configuración optimizada"""
     
@@ -73,6 +79,8 @@ def create_database_engine() -> Engine:
         
         # Performance
         isolation_level="READ_COMMITTED",
+        json_serializer=_json_serializer,
+        json_deserializer=orjson.loads,
         future=True
     )
     
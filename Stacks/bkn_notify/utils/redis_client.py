@@ -3,14 +3,19 @@ Redis client utility
 Manejo centralizado de conexiones Redis para cache y broker
 """
 
+import orjson
 import redis.asyncio as redis
 import logging
 from typing import Optional
 
-from constants import REDIS_URL, REDIS_TTL_DEFAULT
+from redis.exceptions import ResponseError
+
+from constants import REDIS_URL, REDIS_TTL_DEFAULT, REDIS_LOG_STREAM
 
 # Cliente Redis global
 _redis_client: Optional[redis.Redis] = None
+# Helper reutilizado mientras el cliente global no cambie
+_redis_helper: Optional["RedisHelper"] = None
 
 
 async def get_redis_client() -> redis.Redis:
@@ -80,8 +85,7 @@ class RedisHelper:
         try:
             data = await self.redis.get(key)
             if data:
-                import json
-                return json.loads(data)
+                return orjson.loads(data)
             return None
         except Exception as e:
             logging.error(f"Redis GET JSON failed for key {key}: {e}")
@@ -90,8 +94,7 @@ class RedisHelper:
     async def set_json(self, key: str, data: dict, ttl: int = REDIS_TTL_DEFAULT) -> bool:
         """Serializa y guarda JSON"""
         try:
-            import json
-            return await self.redis.setex(key, ttl, json.dumps(data))
+            return await self.redis.setex(key, ttl, orjson.dumps(data, default=str))
         except Exception as e:
             logging.error(f"Redis SET JSON failed for key {key}: {e}")
             return False
@@ -99,16 +102,28 @@ class RedisHelper:
     async def push_log(self, log_key: str, log_entry: dict, max_entries: int = 1000) -> bool:
         """
         Agrega entrada de log y mantiene límite
-        Usa lista Redis con LPUSH + LTRIM
+        Usa stream Redis con XADD MAXLEN ~ (REDIS_LOG_STREAM) o lista con LPUSH + LTRIM
         """
         try:
-            import json
-            
-            # Agregar nueva entrada al inicio
-            await self.redis.lpush(log_key, json.dumps(log_entry))
+            if REDIS_LOG_STREAM:
+                try:
+                    await self.redis.xadd(
+                        log_key,
+                        {"data": orjson.dumps(log_entry, default=str)},
+                        maxlen=max_entries,
+                        approximate=True
+                    )
+                    return True
+                except ResponseError:
+                    # WRONGTYPE: clave creada como lista antes del cambio
+                    pass
             
-            # Mantener solo las últimas max_entries
-            await self.redis.ltrim(log_key, 0, max_entries - 1)
+            # Agregar nueva entrada al inicio y mantener solo las últimas max_entries
+            # (un solo round-trip)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.lpush(log_key, orjson.dumps(log_entry, default=str))
+                pipe.ltrim(log_key, 0, max_entries - 1)
+                await pipe.execute()
             
             return True
         except Exception as e:
@@ -150,6 +165,11 @@ class RedisHelper:
 async def get_redis_helper() -> RedisHelper:
     """
     Obtiene helper Redis con cliente inicializado
+    Se crea una vez por cliente (se recrea si el cliente se cerró y reabrió)
     """
+    global _redis_helper
+    
     client = await get_redis_client()
-    return RedisHelper(client)
\ No newline at end of file
+    if _redis_helper is None or _redis_helper.redis is not client:
+        _redis_helper = RedisHelper(client)
+    return _redis_helper
\ No newline at end of file
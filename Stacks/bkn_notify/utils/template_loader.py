@@ -5,14 +5,21 @@ Carga y maneja plantillas Jinja2 desde filesystem
 
 import os
 import logging
-from typing import Dict, Any, List, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple, FrozenSet
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader, Template, TemplateNotFound, TemplateSyntaxError, StrictUndefined
+from jinja2 import meta, Environment, FileSystemLoader, Template, TemplateNotFound, TemplateSyntaxError, StrictUndefined
 
 from constants import TEMPLATES_DIR
 
-# Cache global de templates compilados
-_template_cache: Dict[str, Template] = {}
+# Cache global de templates compilados (LRU)
+TEMPLATE_CACHE_SIZE = 256
+_template_cache: "OrderedDict[str, Template]" = OrderedDict()
+# Templates por template_id: (mtime del directorio, {file_type: Template}, variables usadas)
+_compiled_templates: "OrderedDict[str, Tuple[float, Dict[str, Template], FrozenSet[str]]]" = OrderedDict()
+# render_template corre en threads (asyncio.to_thread): protege el LRU de templates
+_compiled_templates_lock = threading.Lock()
 _jinja_env: Optional[Environment] = None
 
 
@@ -220,6 +227,7 @@ def compile_template(template_content: str, template_name: str) -> Template:
     cache_key = f"{template_name}:{hash(template_content)}"
     
     if cache_key in _template_cache:
+        _template_cache.move_to_end(cache_key)
         return _template_cache[cache_key]
     
     try:
@@ -228,6 +236,8 @@ def compile_template(template_content: str, template_name: str) -> Template:
         
         # Cache template compilado
         _template_cache[cache_key] = compiled_template
+        if len(_template_cache) > TEMPLATE_CACHE_SIZE:
+            _template_cache.popitem(last=False)
         
         logging.debug(f"Template compiled and cached: {template_name}")
         return compiled_template
@@ -240,6 +250,72 @@ def compile_template(template_content: str, template_name: str) -> Template:
         raise
 
 
+def _template_mtime(template_path: str) -> float:
+    """
+    Última modificación entre los archivos del template (stat, sin leer contenido)
+    """
+    mtime = 0.0
+    with os.scandir(template_path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                mtime = max(mtime, entry.stat().st_mtime)
+    return mtime
+
+
+def get_compiled_templates(template_id: str) -> Dict[str, Template]:
+    """
+    Obtiene templates compilados de un template_id desde cache LRU
+    Se recargan solo si cambió el mtime de algún archivo del template
+    
+    Returns:
+        Dict {file_type: Template} para subject/body_text/body_html
+    """
+    return _get_compiled_entry(template_id)[0]
+
+
+def get_template_variable_names(template_id: str) -> FrozenSet[str]:
+    """
+    Variables no declaradas que usan los archivos del template (calculadas al compilar)
+    """
+    return _get_compiled_entry(template_id)[1]
+
+
+def _get_compiled_entry(template_id: str) -> Tuple[Dict[str, Template], FrozenSet[str]]:
+    """
+    Entrada del LRU de templates: (templates compilados, variables usadas)
+    """
+    
+    template_path = get_template_path(template_id)
+    mtime = _template_mtime(template_path)
+    
+    with _compiled_templates_lock:
+        cached = _compiled_templates.get(template_path)
+        if cached is not None and cached[0] == mtime:
+            _compiled_templates.move_to_end(template_path)
+            return cached[1], cached[2]
+    
+    env = get_jinja_environment()
+    compiled = {}
+    variable_names = set()
+    
+    for file_type, content in load_template_files(template_id).items():
+        try:
+            compiled[file_type] = env.from_string(content)
+            variable_names |= meta.find_undeclared_variables(env.parse(content))
+        except TemplateSyntaxError as e:
+            logging.error(f"Template syntax error in {template_id}:{file_type}: {e}")
+            raise ValueError(f"Template syntax error: {e}")
+    
+    with _compiled_templates_lock:
+        _compiled_templates[template_path] = (mtime, compiled, frozenset(variable_names))
+        _compiled_templates.move_to_end(template_path)
+        if len(_compiled_templates) > TEMPLATE_CACHE_SIZE:
+            _compiled_templates.popitem(last=False)
+    
+    logging.debug(f"Template compiled and cached: {template_id}")
+    return compiled, frozenset(variable_names)
+
+
 def render_template(template_id: str, variables: Dict[str, Any]) -> Dict[str, str]:
     """
     ✅ CORREGIDO: Renderiza template completo con variables
@@ -253,15 +329,14 @@ def render_template(template_id: str, variables: Dict[str, Any]) -> Dict[str, st
     """
     
     try:
-        # Cargar archivos del template
-        template_files = load_template_files(template_id)
+        # Templates compilados (cache LRU por template_id)
+        compiled_templates = get_compiled_templates(template_id)
         
         rendered = {}
         
         # Renderizar cada archivo
-        for file_type, content in template_files.items():
+        for file_type, compiled_template in compiled_templates.items():
             try:
-                compiled_template = compile_template(content, f"{template_id}:{file_type}")
                 rendered_content = compiled_template.render(**variables)
                 rendered[file_type] = rendered_content
                 
@@ -314,8 +389,8 @@ def clear_template_cache():
     """
     Limpia cache de templates compilados
     """
-    global _template_cache
     _template_cache.clear()
+    _compiled_templates.clear()
     logging.info("Template cache cleared")
 
 